@@ -1,6 +1,9 @@
+import functools
+import time
 import unittest.mock
-from collections import OrderedDict
-from functools import cache
+from collections import OrderedDict, namedtuple
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
 # Реализуйте lru_cache декоратор.
 #
 # Требования:
@@ -12,48 +15,142 @@ from functools import cache
 # Декоратор должно быть возможно использовать двумя способами: с
 # указанием максимального кол-ва элементов и без.
 
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'maxsize', 'currsize'])
+
+# Разделитель позиционных и именованных аргументов в ключе; признак промаха
+_KWARGS_MARK = object()
+_MISSING = object()
+
+
+def _make_key(args, kwargs, typed):
+    # Без именованных аргументов ключ - сам кортеж args: он уже создан вызовом, новых объектов нет
+    if not kwargs and not typed:
+        return args
+    key = args
+    if kwargs:
+        # Порядок именованных аргументов не важен: f(c=1, d=2) и f(d=2, c=1) - один ключ
+        items = sorted(kwargs.items())
+        key += (_KWARGS_MARK,) + tuple(items)
+    if typed:
+        key += tuple(type(v) for v in args)
+        if kwargs:
+            key += tuple(type(v) for _, v in items)
+    return key
+
+
 def lru_cache(*args, **kwargs):
     # Обработка двух вариантов использования:
     # 1. @lru_cache без параметров
-    # 2. @lru_cache(maxsize=...) с параметрами
+    # 2. @lru_cache(maxsize=..., typed=...) или @lru_cache(128, True) с параметрами
     if len(args) == 1 and callable(args[0]):
         # Вариант 1: декоратор вызван без параметров
         return lru_cache(maxsize=None)(args[0])
     else:
         # Вариант 2: декоратор вызван с параметрами
-        maxsize = kwargs.get('maxsize', None)
+        if len(args) > 2:
+            raise TypeError(f"lru_cache(maxsize, typed): лишние аргументы {args[2:]}")
+        maxsize = kwargs.get('maxsize', args[0] if args else None)
+        # typed=True: f(1) и f(1.0) кешируются отдельно
+        typed = kwargs.get('typed', args[1] if len(args) > 1 else False)
+        if maxsize is not None and not isinstance(maxsize, int):
+            raise TypeError("maxsize должен быть целым числом или None")
 
         def decorator(func):
             # Кеш в виде OrderedDict для отслеживания порядка использования
-            cache = OrderedDict()
+            # (без ограничения размера порядок не нужен - обычный dict)
+            cache = {} if maxsize is None else OrderedDict()
+            # Вставка и вытеснение - под блокировкой: декоратор используют из пулов потоков.
+            # Чтение и move_to_end - без неё: это отдельные атомарные операции словаря,
+            # а сама функция вызывается вне блокировки
+            lock = Lock()
+            # hits, misses, evictions; hits считаются без блокировки и при одновременных
+            # попаданиях из разных потоков могут быть чуть занижены
+            stats = [0, 0, 0]
+
+            def wrapper_unbounded(*args, **kwargs):
+                key = args if not kwargs and not typed else _make_key(args, kwargs, typed)
+                result = cache.get(key, _MISSING)
+                if result is not _MISSING:
+                    stats[0] += 1
+                    return result
+                result = func(*args, **kwargs)
+                with lock:
+                    stats[1] += 1
+                    # Другой поток мог успеть посчитать то же самое - оставляем его результат
+                    return cache.setdefault(key, result)
+
+            def wrapper_bounded(*args, **kwargs):
+                key = args if not kwargs and not typed else _make_key(args, kwargs, typed)
+                # Один поиск в словаре; при попадании обновляем порядок использования
+                result = cache.get(key, _MISSING)
+                if result is not _MISSING:
+                    try:
+                        cache.move_to_end(key)
+                    except KeyError:
+                        # Другой поток только что вытеснил запись - результат всё равно верный
+                        pass
+                    stats[0] += 1
+                    return result
+                result = func(*args, **kwargs)
+                with lock:
+                    stats[1] += 1
+                    # Поиск и вставка одной операцией; если другой поток успел сохранить
+                    # свой результат, возвращаем его
+                    stored = cache.setdefault(key, result)
+                    if stored is not result:
+                        cache.move_to_end(key)
+                        return stored
+                    # Если достигнут максимальный размер кеша, удаляем самый старый элемент
+                    if len(cache) > maxsize:
+                        cache.popitem(last=False)
+                        stats[2] += 1
+                return result
 
-            def wrapper(*args, **kwargs):
-                # Создаем ключ на основе позиционных и именованных аргументов
-                key = (args, frozenset(kwargs.items()))
+            def wrapper_disabled(*args, **kwargs):
+                # maxsize=0: ничего не храним, только считаем вызовы
+                with lock:
+                    stats[1] += 1
+                return func(*args, **kwargs)
 
-                # Проверяем, есть ли результат в кеше
-                if key in cache:
-                    # Обновляем порядок использования (перемещаем в конец)
-                    cache.move_to_end(key)
-                    return cache[key]
+            if maxsize is None:
+                wrapper = wrapper_unbounded
+            elif maxsize <= 0:
+                wrapper = wrapper_disabled
+            else:
+                wrapper = wrapper_bounded
 
-                # Вызываем оригинальную функцию, если результат не в кеше
-                result = func(*args, **kwargs)
+            def cache_info():
+                with lock:
+                    return CacheInfo(stats[0], stats[1], stats[2], maxsize, len(cache))
 
-                # Сохраняем результат в кеш
-                cache[key] = result
-                # Обновляем порядок использования
-                cache.move_to_end(key)
+            def cache_clear():
+                with lock:
+                    cache.clear()
+                    stats[:] = [0, 0, 0]
 
-                # Если достигнут максимальный размер кеша, удаляем самый старый элемент
-                if maxsize is not None and len(cache) > maxsize:
-                    cache.popitem(last=False)
+            wrapper.cache_info = cache_info
+            wrapper.cache_clear = cache_clear
+            return functools.update_wrapper(wrapper, func)
 
-                return result
+        return decorator
 
-            return wrapper
 
-        return decorator
+def benchmark(number: int = 200000):
+    """Сравнение с functools.lru_cache: почти одни попадания и почти одни промахи"""
+    workloads = {
+        # 100 разных аргументов на кеш в 128 элементов
+        'попадания': [(i % 100, 0) for i in range(number)],
+        # Все аргументы разные: каждый вызов - промах и вытеснение
+        'промахи': [(i, i + 1) for i in range(number)],
+    }
+    for name, calls in workloads.items():
+        for label, decorator in (('lru_cache', lru_cache), ('functools', functools.lru_cache)):
+            func = decorator(maxsize=128)(lambda a, b: a + b)
+            start = time.perf_counter()
+            for call in calls:
+                func(*call)
+            elapsed = time.perf_counter() - start
+            print(f'{name:<10} {label:<10} {elapsed / number * 1e9:7.0f} нс/вызов')
 
 
 @lru_cache
@@ -91,4 +188,26 @@ if __name__ == '__main__':
     assert decorated(5, 6) == 3
     assert decorated(5, 6) == 3
     assert decorated(1, 2) == 4
-    assert mocked_func.call_count == 4
\ No newline at end of file
+    assert mocked_func.call_count == 4
+
+    assert decorated.cache_info() == (3, 4, 2, 2, 2)
+    decorated.cache_clear()
+    assert decorated.cache_info() == (0, 0, 0, 2, 0)
+
+    typed_square = lru_cache(maxsize=10, typed=True)(lambda x: x * x)
+    assert typed_square(3) == 9 and typed_square(3.0) == 9.0
+    assert typed_square.cache_info().currsize == 2
+    # maxsize и typed можно передать позиционно, как в functools.lru_cache
+    typed_positional = lru_cache(10, True)(lambda x: x)
+    typed_positional(1), typed_positional(1.0)
+    assert typed_positional.cache_info().currsize == 2
+
+    # Одновременные вызовы из пула потоков не ломают кеш
+    shared = lru_cache(maxsize=50)(lambda x: x + 1)
+    with ThreadPoolExecutor(8) as executor:
+        assert list(executor.map(shared, [i % 100 for i in range(20000)])) == [i % 100 + 1 for i in range(20000)]
+    info = shared.cache_info()
+    # Промах, который другой поток уже успел сохранить, ничего не вытесняет
+    assert info.currsize == 50 and info.evictions <= info.misses - 50
+
+    benchmark()
@@ -0,0 +1,268 @@
+"""
+Бенчмарк загрузчиков async_http(8).py и async_http(9).py без доступа в интернет.
+
+Поднимает mock_server.py на нескольких портах (разные хосты), генерирует файл URL
+через create_data.generate_mock_urls (маленькие и большие JSON, медленные ответы, 404/500,
+обрывы соединения, не-JSON) и запускает каждый загрузчик с каждым уровнем параллелизма
+в отдельном процессе. Для каждого прогона - URL/с, пиковая память процесса (RSS),
+задержка цикла событий и проверка файла результатов. Итог - JSON:
+
+    python benchmark.py --count 10000 --fetchers 8 9 --concurrency 5 20 50 --output results.json
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from create_data import generate_mock_urls
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SOLUTION_DIR = os.path.join(HERE, "solution")
+MOCK_SERVER = os.path.join(HERE, "mock_server.py")
+FETCHERS = {"8": "async_http(8).py", "9": "async_http(9).py"}
+
+# Что должно оказаться в результатах для каждого типа URL заглушки
+# (9): только успешно разобранные JSON; (8): ожидаемый статус-код (0 - ошибка соединения)
+EXPECTED_IN_OUTPUT_9 = {"json", "big", "slow"}
+EXPECTED_STATUS_8 = {"json": 200, "big": 200, "slow": 200, "html": 200, "404": 404, "500": 500, "reset": 0}
+
+# Период пробной задачи, по которой измеряется задержка цикла событий
+LAG_PROBE_INTERVAL = 0.01
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"mock_server не поднялся на порту {port}")
+
+
+def url_kind(url: str) -> str:
+    path = urlsplit(url).path.strip("/")
+    return path.split("/")[1] if path.startswith("status/") else path
+
+
+def url_id(url: str) -> int:
+    return int(parse_qs(urlsplit(url).query)["id"][0])
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт килобайты, macOS - байты
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def load_fetcher(name: str):
+    sys.path.insert(0, SOLUTION_DIR)
+    spec = importlib.util.spec_from_file_location(f"fetcher_{name}", os.path.join(SOLUTION_DIR, FETCHERS[name]))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+async def probe_lag(samples: list):
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LAG_PROBE_INTERVAL)
+        samples.append(loop.time() - start - LAG_PROBE_INTERVAL)
+
+
+async def run_fetcher(name: str, urls_file: str, output_file: str, concurrency: int) -> dict:
+    module = load_fetcher(name)
+    # Общий лимит и лимит на хост - из параметров бенчмарка, остальное как в самом загрузчике
+    module.CONCURRENCY = concurrency
+    module.MAX_HOST_CONCURRENCY = min(module.MAX_HOST_CONCURRENCY, concurrency)
+    if hasattr(module, "WORKERS"):
+        module.WORKERS = concurrency * 2
+
+    lags = []
+    probe = asyncio.create_task(probe_lag(lags))
+    started = time.perf_counter()
+    if name == "8":
+        from scheduler import iter_urls
+        await module.fetch_urls(iter_urls(urls_file), output_file)
+    else:
+        await module.fetch_urls(urls_file, output_file, fresh=True)
+    elapsed = time.perf_counter() - started
+    probe.cancel()
+
+    lags.sort()
+    return {
+        "seconds": round(elapsed, 3),
+        "peak_rss_mb": peak_rss_mb(),
+        "loop_lag_max_ms": round(lags[-1] * 1000, 1) if lags else 0.0,
+        "loop_lag_p99_ms": round(lags[int(0.99 * (len(lags) - 1))] * 1000, 1) if lags else 0.0,
+    }
+
+
+def check_output(name: str, urls_file: str, output_file: str) -> dict:
+    """Сверяет файл результатов с тем, что заглушка должна была отдать по каждому URL"""
+    with open(urls_file, encoding="utf-8") as f:
+        kinds = {url.strip(): url_kind(url.strip()) for url in f if url.strip()}
+
+    seen = set()
+    invalid = duplicates = unexpected = wrong = 0
+    with open(output_file, "rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                url = record["url"]
+            except (ValueError, KeyError, TypeError):
+                invalid += 1
+                continue
+            if url in seen:
+                duplicates += 1
+            seen.add(url)
+            kind = kinds.get(url)
+            if name == "8":
+                wrong += record.get("status_code") != EXPECTED_STATUS_8.get(kind)
+            elif kind not in EXPECTED_IN_OUTPUT_9:
+                unexpected += 1
+            elif kind in ("json", "slow") and record["content"].get("id") != url_id(url):
+                wrong += 1
+
+    if name == "8":
+        expected = set(kinds)
+    else:
+        expected = {url for url, kind in kinds.items() if kind in EXPECTED_IN_OUTPUT_9}
+    missing = len(expected - seen)
+    return {
+        "records": len(seen),
+        "missing": missing,
+        "duplicates": duplicates,
+        "unexpected": unexpected,
+        "wrong": wrong,
+        "invalid": invalid,
+        "ok": not (missing or duplicates or unexpected or wrong or invalid),
+    }
+
+
+def run_one(name: str, urls_file: str, output_file: str, concurrency: int, work_dir: str) -> dict:
+    """
+    Запускает загрузчик в отдельном процессе, чтобы пиковая память относилась только к нему.
+    Файл результатов проверяется там же, после замера: ru_maxrss переживает fork и exec,
+    и разбор больших записей в этом процессе завысил бы память следующих прогонов.
+    """
+    log_path = os.path.join(work_dir, f"fetcher{name}-c{concurrency}.log")
+    with open(log_path, "w", encoding="utf-8") as log:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run-one", name, "--urls", urls_file,
+             "--result", output_file, "--concurrency", str(concurrency)],
+            cwd=SOLUTION_DIR, stdout=subprocess.PIPE, stderr=log, text=True,
+        )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Загрузчик {FETCHERS[name]} завершился с кодом {completed.returncode}, см. {log_path}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def benchmark(fetchers, concurrency_levels, count: int, hosts: int, big: int, big_mb: float,
+              slow_ms: int, work_dir: str) -> dict:
+    ports = [free_port() for _ in range(hosts)]
+    urls_file = os.path.join(work_dir, "urls.txt")
+    counts = generate_mock_urls(urls_file, count, [f"http://127.0.0.1:{port}" for port in ports],
+                                big, big_mb, slow_ms)
+    server = subprocess.Popen(
+        [sys.executable, MOCK_SERVER, "--ports", *map(str, ports)],
+        stdout=subprocess.DEVNULL,
+    )
+    runs = []
+    try:
+        for port in ports:
+            wait_for_port(port)
+        for name in fetchers:
+            for concurrency in concurrency_levels:
+                output_file = os.path.join(work_dir, f"results{name}-c{concurrency}.jsonl")
+                run = {"fetcher": FETCHERS[name], "concurrency": concurrency}
+                run.update(run_one(name, urls_file, output_file, concurrency, work_dir))
+                run["urls_per_sec"] = round(count / run["seconds"], 1)
+                runs.append(run)
+                print(
+                    f"{FETCHERS[name]:>17} c={concurrency:<4} {run['urls_per_sec']:>9} URL/с, "
+                    f"RSS {run['peak_rss_mb']} МБ, лаг цикла max {run['loop_lag_max_ms']} мс, "
+                    f"проверка: {'ok' if run['check']['ok'] else run['check']}",
+                    file=sys.stderr,
+                )
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        "config": {
+            "count": count,
+            "hosts": hosts,
+            "big": big,
+            "big_mb": big_mb,
+            "slow_ms": slow_ms,
+            "mix": counts,
+        },
+        "runs": runs,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк загрузчиков URL с локальной заглушкой HTTP")
+    parser.add_argument("--fetchers", nargs="+", choices=list(FETCHERS), default=list(FETCHERS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[5],
+                        help="общий лимит запросов; по условию задачи 5, большие значения - для сравнения")
+    parser.add_argument("--count", type=int, default=10000, help="число URL (10 000 - 100 000)")
+    parser.add_argument("--hosts", type=int, default=4, help="число портов заглушки (хостов)")
+    parser.add_argument("--big", type=int, default=2, help="сколько URL с большим JSON")
+    parser.add_argument("--big-mb", type=float, default=50, help="размер большого JSON, МБ")
+    parser.add_argument("--slow-ms", type=int, default=200, help="задержка медленных ответов, мс")
+    parser.add_argument("--work-dir", help="каталог для файлов URL и результатов (по умолчанию временный)")
+    parser.add_argument("--output", help="файл для JSON с результатами (по умолчанию stdout)")
+    # Внутренний режим: один прогон загрузчика в этом процессе
+    parser.add_argument("--run-one", choices=list(FETCHERS), help=argparse.SUPPRESS)
+    parser.add_argument("--urls", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        import logging
+        logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+        run = asyncio.run(run_fetcher(args.run_one, args.urls, args.result, args.concurrency[0]))
+        run["check"] = check_output(args.run_one, args.urls, args.result)
+        print(json.dumps(run))
+        sys.exit()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="fetch_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        results = benchmark(args.fetchers, args.concurrency, args.count, args.hosts, args.big, args.big_mb,
+                            args.slow_ms, work_dir)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    report = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+    else:
+        print(report)
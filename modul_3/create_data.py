@@ -1,5 +1,7 @@
+import argparse
 import asyncio
 import logging
+import random
 
 # Настройка логирования
 logging.basicConfig(
@@ -33,7 +35,63 @@ async def generate_test_urls():
     logger.info(f"Создан тестовый файл urls.txt с {len(test_urls)} URL")
 
 
+# Доли типов URL для заглушки mock_server.py (кроме больших JSON, их число задаётся отдельно)
+MOCK_MIX = {
+    "json": 0.86,
+    "slow": 0.04,
+    "404": 0.03,
+    "500": 0.03,
+    "reset": 0.02,
+    "html": 0.02,
+}
+
+
+def mock_url(base_url: str, kind: str, n: int, big_mb: float = 50, slow_ms: int = 200) -> str:
+    if kind == "big":
+        return f"{base_url}/big?id={n}&mb={big_mb}"
+    if kind == "slow":
+        return f"{base_url}/slow?id={n}&ms={slow_ms}"
+    if kind in ("404", "500"):
+        return f"{base_url}/status/{kind}?id={n}"
+    return f"{base_url}/{kind}?id={n}"
+
+
+def generate_mock_urls(path: str, count: int, base_urls: list, big: int = 2, big_mb: float = 50,
+                       slow_ms: int = 200, seed: int = 0) -> dict:
+    """
+    Пишет в path count URL для mock_server.py: смесь типов по MOCK_MIX и big больших JSON,
+    вперемешку по хостам base_urls. Смесь воспроизводима при том же seed.
+    Возвращает число URL каждого типа.
+    """
+    rng = random.Random(seed)
+    big_positions = set(rng.sample(range(count), min(big, count)))
+    kinds, weights = list(MOCK_MIX), list(MOCK_MIX.values())
+    counts = {}
+    with open(path, "w", encoding="utf-8") as f:
+        for n in range(count):
+            kind = "big" if n in big_positions else rng.choices(kinds, weights)[0]
+            counts[kind] = counts.get(kind, 0) + 1
+            f.write(mock_url(rng.choice(base_urls), kind, n, big_mb, slow_ms) + "\n")
+    return counts
+
+
 async def main():
+    parser = argparse.ArgumentParser(description="Создание файла data/urls.txt для загрузчиков")
+    parser.add_argument("--count", type=int,
+                        help="сгенерировать столько URL для mock_server.py вместо списка реальных сайтов")
+    parser.add_argument("--base-url", nargs="+", default=["http://127.0.0.1:8801"],
+                        help="адреса заглушки (разные порты - разные хосты)")
+    parser.add_argument("--big", type=int, default=2, help="сколько URL с большим JSON")
+    parser.add_argument("--big-mb", type=float, default=50, help="размер большого JSON, МБ")
+    parser.add_argument("--slow-ms", type=int, default=200, help="задержка медленных ответов, мс")
+    parser.add_argument("--output", default="data/urls.txt")
+    args = parser.parse_args()
+
+    if args.count:
+        counts = generate_mock_urls(args.output, args.count, args.base_url, args.big, args.big_mb, args.slow_ms)
+        logger.info(f"Создан файл {args.output} с {args.count} URL для заглушки: {counts}")
+        return
+
     await generate_test_urls()
 
     # Проверяем, что файл создан
@@ -0,0 +1,123 @@
+"""
+Локальная заглушка HTTP для проверки и бенчмарка загрузчиков из solution без интернета.
+
+Маршруты (параметр id делает URL уникальными):
+    /json?id=N              - маленький JSON {"id": N, ...}
+    /big?id=N&mb=M          - JSON примерно на M мегабайт, отдаётся потоком (chunked)
+    /slow?id=N&ms=T         - маленький JSON с задержкой T миллисекунд
+    /status/CODE?id=N       - пустой ответ с кодом CODE (404, 500, ...)
+    /reset?id=N             - соединение обрывается без ответа
+    /html?id=N              - не JSON
+
+JSON-маршруты отдают ETag и отвечают 304 на совпавший If-None-Match.
+Слушает несколько портов сразу: для загрузчиков это разные хосты (у каждого свой лимит).
+
+    python mock_server.py --ports 8801 8802 8803 8804
+"""
+import argparse
+import asyncio
+
+from aiohttp import web
+
+
+# Один элемент большого JSON; блок из них повторяется, пока не наберётся нужный размер
+BIG_ITEM = b'{"id": %d, "name": "item", "tags": ["a", "b", "c"], "value": 0.5}'
+BIG_BLOCK = b', '.join(BIG_ITEM % i for i in range(500)) + b', '
+
+
+def request_id(request: web.Request) -> int:
+    return int(request.query.get("id", 0))
+
+
+def etag(request: web.Request) -> str:
+    # Содержимое заглушки зависит только от URL
+    return f'"{request.path}-{request.query_string}"'
+
+
+def not_modified(request: web.Request):
+    if request.headers.get("If-None-Match") == etag(request):
+        return web.Response(status=304, headers={"ETag": etag(request)})
+    return None
+
+
+async def small_json(request: web.Request) -> web.Response:
+    cached = not_modified(request)
+    if cached is not None:
+        return cached
+    return web.json_response({"id": request_id(request), "title": "small", "values": list(range(10))},
+                             headers={"ETag": etag(request)})
+
+
+async def big_json(request: web.Request) -> web.StreamResponse:
+    cached = not_modified(request)
+    if cached is not None:
+        return cached
+    size = int(float(request.query.get("mb", 1)) * 1024 * 1024)
+    response = web.StreamResponse(headers={"Content-Type": "application/json", "ETag": etag(request)})
+    await response.prepare(request)
+    try:
+        await response.write(b'{"id": %d, "items": [' % request_id(request))
+        sent = 0
+        while sent < size:
+            await response.write(BIG_BLOCK)
+            sent += len(BIG_BLOCK)
+        await response.write(b'{}]}')
+    except ConnectionError:
+        # Клиенту хватило заголовков (например, async_http(8).py) - он закрыл соединение
+        pass
+    return response
+
+
+async def slow_json(request: web.Request) -> web.Response:
+    await asyncio.sleep(int(request.query.get("ms", 200)) / 1000)
+    cached = not_modified(request)
+    if cached is not None:
+        return cached
+    return web.json_response({"id": request_id(request), "title": "slow"}, headers={"ETag": etag(request)})
+
+
+async def status(request: web.Request) -> web.Response:
+    return web.Response(status=int(request.match_info["code"]))
+
+
+async def reset(request: web.Request) -> web.Response:
+    request.transport.abort()
+    # Ответ уже некуда отправить - соединение закрыто
+    return web.Response()
+
+
+async def html(request: web.Request) -> web.Response:
+    return web.Response(text="<html><body>not json</body></html>", content_type="text/html")
+
+
+def make_app() -> web.Application:
+    app = web.Application()
+    app.router.add_get("/json", small_json)
+    app.router.add_get("/big", big_json)
+    app.router.add_get("/slow", slow_json)
+    app.router.add_get("/status/{code}", status)
+    app.router.add_get("/reset", reset)
+    app.router.add_get("/html", html)
+    return app
+
+
+async def serve(host: str, ports: list):
+    runner = web.AppRunner(make_app(), access_log=None)
+    await runner.setup()
+    for port in ports:
+        await web.TCPSite(runner, host, port).start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальная заглушка HTTP для загрузчиков URL")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--ports", type=int, nargs="+", default=[8801])
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.ports))
+    except KeyboardInterrupt:
+        pass
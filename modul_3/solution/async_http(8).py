@@ -1,46 +1,68 @@
+import argparse
 import asyncio
 import aiohttp
-import json
-from typing import Dict, List
-from tqdm.asyncio import tqdm_asyncio
+from collections import Counter
+from typing import Dict, Iterable
+from tqdm import tqdm
+
+from host_limiter import HostLimiter, make_connector
+from result_writer import ResultWriter
+from scheduler import iter_urls, map_bounded
 
 input_file = "../data/urls.txt"
 output_file = "../data/results.jsonl"
 
+# Общее число одновременных запросов - не больше 5 по условию задачи (task_description.txt);
+# под этим общим лимитом к одному хосту - от HOST_CONCURRENCY до MAX_HOST_CONCURRENCY (подстраивает HostLimiter)
+CONCURRENCY = 5
+HOST_CONCURRENCY = 2
+MAX_HOST_CONCURRENCY = CONCURRENCY
+
+
 async def fetch_url(
         url: str,
         session: aiohttp.ClientSession,
-        semaphore: asyncio.Semaphore
+        limiter: HostLimiter
 ) -> Dict[str, int]:
     try:
-        async with semaphore:
-            async with session.get(url, timeout=1) as response:
-                return {"url": url, "status_code": response.status}
+        async with limiter.slot(url) as slot, session.get(url, timeout=1) as response:
+            slot.response(response.status)
+            return {"url": url, "status_code": response.status}
     except (aiohttp.ClientError, asyncio.TimeoutError):
         return {"url": url, "status_code": 0}
     except Exception:
         return {"url": url, "status_code": 0}
 
 
-async def fetch_urls(urls: List[str], file_path: str) -> List[Dict[str, int]]:
-    semaphore = asyncio.Semaphore(5)
-    async with aiohttp.ClientSession() as session:
-        tasks = [fetch_url(url, session, semaphore) for url in urls]
-        results = await tqdm_asyncio.gather(*tasks, desc="Processing URLs")
-
-    with open(file_path, "w") as f:
-        for result in results:
-            f.write(json.dumps(result) + "\n")
-    return results
+async def fetch_urls(urls: Iterable[str], file_path: str) -> Dict[int, int]:
+    # urls может быть генератором (например, scheduler.iter_urls) - читается лениво.
+    # Результаты только пишутся в файл, в памяти остаётся лишь счётчик статус-кодов
+    total = len(urls) if hasattr(urls, '__len__') else None
+    status_counts = Counter()
+    # Строки пишутся пачками по ходу загрузки, а не все разом в конце
+    limiter = HostLimiter(CONCURRENCY, initial=HOST_CONCURRENCY, max_limit=MAX_HOST_CONCURRENCY)
+    connector = make_connector(CONCURRENCY, MAX_HOST_CONCURRENCY)
+    async with aiohttp.ClientSession(connector=connector) as session, ResultWriter(file_path) as writer:
+        with tqdm(total=total, desc="Processing URLs") as progress:
+            # Рабочих вдвое больше общего лимита: пока часть ждёт занятый хост, остальные загружают с других
+            async for result in map_bounded(lambda url: fetch_url(url, session, limiter), urls, CONCURRENCY * 2):
+                status_counts[result["status_code"]] += 1
+                await writer.put(result["url"], result)
+                progress.update()
+    return status_counts
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Статус-коды для списка URL")
+    parser.add_argument("--input", help=f"файл со списком URL (например, {input_file}); без него - примеры ниже")
+    parser.add_argument("--output", default=output_file, help="файл результатов JSONL")
+    args = parser.parse_args()
     urls = [
         "https://example.com",
         "https://httpbin.org/status/404",
         "https://nonexistent.url"
     ]
-    asyncio.run(fetch_urls(urls, output_file))
+    asyncio.run(fetch_urls(iter_urls(args.input) if args.input else urls, args.output))
 
 # import asyncio
 #
@@ -1,32 +1,195 @@
+import argparse
+import os
+import re
 import sys
+import tempfile
 import aiohttp
 import asyncio
 import json
 import logging
 from aiohttp import ClientSession, ClientError
+from concurrent.futures import ProcessPoolExecutor
 
+from circuit_breaker import CircuitBreaker, RetryBudget, backoff_delay
+from crawl_journal import CrawlJournal
+from host_limiter import HostLimiter, make_connector
+from json_decode import TempRecordFile, decode_to_record
+from json_stream import JsonStreamValidator
+from result_writer import ResultWriter
+from scheduler import Retry, iter_unique_urls, map_bounded
+from validator_store import ValidatorStore
+
+
+INPUT_FILE = "../data/urls.txt"
+OUTPUT_FILE = "../data/results.jsonl"
+LOG_FILE = "../data/fetch_urls.log"
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('../data/fetch_urls.log', encoding='utf-8')
-    ],
-    encoding='utf-8'
-)
 logger = logging.getLogger(__name__)
 
-async def fetch_single_url(session: ClientSession, url: str, semaphore: asyncio.Semaphore):
+
+def setup_logging(log_file: str = LOG_FILE, level: int = logging.INFO):
+    """Настройка логирования: в stdout и, если log_file задан, в файл"""
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+    logging.basicConfig(
+        level=level,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=handlers,
+        encoding='utf-8'
+    )
+
+# Размер порции при потоковом чтении тела ответа; столько же запись держит в памяти,
+# прежде чем уйти во временный файл на диске
+STREAM_BUFFER_SIZE = 64 * 1024
+
+# Результат fetch_single_url для URL, который не загрузится и при повторе (4xx, не JSON):
+# такой URL попадает в журнал как failed и после перезапуска не запрашивается.
+# None означает временную ошибку (таймаут, соединение, 5xx) - URL будет запрошен снова.
+FAILED = object()
+
+# Общее число одновременных загрузок - не больше 5 по условию задачи (task_description.txt)
+CONCURRENCY = 5
+# Лимит одновременных запросов к одному хосту под общим лимитом: начальный (дальше подстраивается
+# HostLimiter) и наибольший - один хост может занять весь общий лимит
+HOST_CONCURRENCY = 2
+MAX_HOST_CONCURRENCY = CONCURRENCY
+# Рабочих задач больше общего лимита: пока часть ждёт занятый хост, остальные загружают с других
+WORKERS = CONCURRENCY * 2
+
+# Повторы при временных ошибках (таймаут, соединение, 5xx): не больше MAX_RETRIES на URL
+# и не больше 10% от числа запросов на всю загрузку
+MAX_RETRIES = 3
+RETRY_BUDGET_RATIO = 0.1
+# После стольких подряд неудачных подключений URL хоста откладываются до следующего запуска,
+# а через BREAKER_OPEN_TIMEOUT секунд хост проверяется одним пробным запросом
+BREAKER_THRESHOLD = 5
+BREAKER_OPEN_TIMEOUT = 30.0
+
+# Без потокового режима ответы больше этого размера разбираются в отдельных процессах,
+# если задан decode_workers; меньшие - прямо в цикле событий
+DECODE_THRESHOLD = 4 * 1024 * 1024
+# Тот же признак JSON-ответа, что проверяет response.json()
+JSON_CONTENT_TYPE = re.compile(r'^application/(?:[\w.+-]+?\+)?json')
+
+# Общий таймаут запроса и таймаут подключения: недоступный хост не держит место минуту
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=60, sock_connect=10)
+
+
+def is_permanent_status(status: int) -> bool:
+    return 400 <= status < 500 and status not in (408, 429)
+
+
+async def stream_record(response: aiohttp.ClientResponse, url: str, buffer_size: int):
+    """
+    Читает тело ответа порциями и сразу пишет его в запись JSONL {"url": ..., "content": ...}
+    во временный файл (в памяти до buffer_size байт, дальше - на диске).
+    JSON проверяется по ходу чтения, поэтому память не зависит от размера ответа.
+    При невалидном JSON запись отбрасывается и возвращается None.
+    """
+    validator = JsonStreamValidator()
+    record = tempfile.SpooledTemporaryFile(max_size=buffer_size)
+    try:
+        record.write(b'{"url": ' + json.dumps(url, ensure_ascii=False).encode('utf-8') + b', "content": ')
+        async for chunk in response.content.iter_chunked(buffer_size):
+            validator.feed(chunk)
+            record.write(validator.to_line(chunk))
+        validator.close()
+        record.write(b'}\n')
+    except ValueError as e:
+        record.close()
+        logger.error(f"Ошибка парсинга JSON с {url}: {str(e)}")
+        return None
+    except BaseException:
+        record.close()
+        raise
+    record.seek(0)
+    return record
+
+
+async def decode_json(response: aiohttp.ClientResponse, url: str, pool: ProcessPoolExecutor):
     """
-    Асинхронно загружает один URL и возвращает данные в формате JSON
+    Читает тело ответа; до DECODE_THRESHOLD байт разбирает прямо здесь и возвращает dict,
+    а больший ответ сохраняет во временный файл и разбирает в процессе из pool (decode_to_record),
+    не останавливая цикл событий. Тогда возвращается файл с готовой строкой JSONL.
+    Размер определяется по ходу чтения, поэтому Content-Length не обязателен.
+    """
+    if not JSON_CONTENT_TYPE.match(response.content_type):
+        logger.error(f"Ответ с {url} не JSON: {response.content_type}")
+        return FAILED
+    head = bytearray()
+    body = None
+    try:
+        async for chunk in response.content.iter_chunked(STREAM_BUFFER_SIZE):
+            if body is not None:
+                body.write(chunk)
+                continue
+            head += chunk
+            if len(head) > DECODE_THRESHOLD:
+                body = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
+                body.write(head)
+                head = None
+        if body is None:
+            return {"url": url, "content": json.loads(head)}
+        body.close()
+        record_path = await asyncio.get_running_loop().run_in_executor(pool, decode_to_record, body.name, url)
+    except ValueError as e:
+        logger.error(f"Ошибка парсинга JSON с {url}: {str(e)}")
+        return FAILED
+    finally:
+        if body is not None:
+            body.close()
+            os.remove(body.name)
+    return TempRecordFile(record_path)
+
+
+async def fetch_single_url(session: ClientSession, url: str, limiter: HostLimiter, breaker: CircuitBreaker,
+                           stream: bool = True, buffer_size: int = STREAM_BUFFER_SIZE,
+                           decode_pool: ProcessPoolExecutor = None, store: ValidatorStore = None):
+    """
+    Асинхронно загружает один URL и возвращает данные в формате JSON.
+    В потоковом режиме (stream=True) тело не разбирается в объект Python:
+    возвращается временный файл с готовой строкой JSONL (см. stream_record).
+    Иначе, если задан decode_pool, большие ответы разбираются в нём (см. decode_json).
+    Число одновременных запросов к хосту URL ограничивает limiter;
+    URL хоста, на котором сработал breaker, сразу возвращаются как временная ошибка (None).
+    С store запрос условный: на 304 возвращается запись из прошлого прогона (см. ValidatorStore).
     """
     cleaned_url = url.strip()
+    # До занятия места в лимитере: URL недоступного хоста отклоняются сразу, а не в очереди
+    # за пробным запросом, который держит единственное место хоста до таймаута
+    if not breaker.allow(cleaned_url):
+        logger.warning(f"Хост недоступен, URL отложен: {cleaned_url}")
+        return None
+    reachable = None
     try:
-        async with semaphore:  # Ограничение одновременных запросов
-            async with session.get(cleaned_url, timeout=aiohttp.ClientTimeout(total=60)) as response:
-                if response.status == 200:
+        async with limiter.slot(cleaned_url) as slot:
+            reachable = False
+            headers = store.conditional_headers(cleaned_url) if store is not None else None
+            async with session.get(cleaned_url, timeout=REQUEST_TIMEOUT, headers=headers) as response:
+                reachable = True
+                slot.response(response.status)
+                if store is not None and response.status in (200, 304):
+                    store.remember(cleaned_url, response.headers)
+                if response.status == 304 and store is not None:
+                    record = await store.reuse(cleaned_url)
+                    if record is None:
+                        logger.warning(f"Прошлая запись для {cleaned_url} не найдена, загрузим заново")
+                        return None
+                    logger.info(f"Не изменился: {cleaned_url}")
+                    return record
+                if response.status == 200 and stream:
+                    record = await stream_record(response, cleaned_url, buffer_size)
+                    if record is None:
+                        return FAILED
+                    logger.info(f"Успешно загружено: {cleaned_url}")
+                    return record
+                elif response.status == 200 and decode_pool is not None:
+                    record = await decode_json(response, cleaned_url, decode_pool)
+                    if record is not FAILED:
+                        logger.info(f"Успешно загружено: {cleaned_url}")
+                    return record
+                elif response.status == 200:
                     try:
                         data = await response.json()
                         logger.info(f"Успешно загружено: {cleaned_url}")
@@ -34,30 +197,77 @@ async def fetch_single_url(session: ClientSession, url: str, semaphore: asyncio.
                     except json.JSONDecodeError:
                         text = await response.text()
                         logger.error(f"Ошибка парсинга JSON с {cleaned_url}. Ответ: {text[:200]}...")
+                        return FAILED
+                    except aiohttp.ContentTypeError as e:
+                        logger.error(f"Ответ с {cleaned_url} не JSON: {str(e)}")
+                        return FAILED
                     except Exception as e:
                         logger.error(f"Ошибка обработки ответа с {cleaned_url}: {str(e)}")
                 else:
                     logger.error(f"HTTP ошибка {response.status} для {cleaned_url}")
+                    if is_permanent_status(response.status):
+                        return FAILED
     except asyncio.TimeoutError:
         logger.error(f"Таймаут при загрузке {cleaned_url}")
     except ClientError as e:
         logger.error(f"Ошибка соединения с {cleaned_url}: {str(e)}")
     except Exception as e:
         logger.error(f"Неожиданная ошибка при загрузке {cleaned_url}: {str(e)}")
+    finally:
+        if reachable is not None:
+            breaker.record(cleaned_url, reachable)
     return None
 
 
-async def fetch_urls():
+async def fetch_with_retries(session: ClientSession, url: str, limiter: HostLimiter, breaker: CircuitBreaker,
+                             budget: RetryBudget, stream: bool = True, buffer_size: int = STREAM_BUFFER_SIZE,
+                             decode_pool: ProcessPoolExecutor = None, store: ValidatorStore = None,
+                             attempt: int = 0):
+    """
+    fetch_single_url с повторами временных ошибок: до MAX_RETRIES раз с экспоненциальной
+    задержкой и разбросом, пока не исчерпан общий бюджет повторов и хост не отключён breaker.
+    Задержку здесь не ждём: возвращается Retry((url, attempt + 1), задержка), и map_bounded
+    вернёт URL в очередь позже, а рабочая задача тем временем загружает другие URL.
+    """
+    if not attempt:
+        budget.request()
+    result = await fetch_single_url(session, url, limiter, breaker, stream, buffer_size, decode_pool, store)
+    if result is not None or attempt == MAX_RETRIES or breaker.is_open(url) or not budget.take():
+        return result
+    return Retry((url, attempt + 1), backoff_delay(attempt))
+
+
+async def fetch_urls(input_file: str = INPUT_FILE, output_file: str = OUTPUT_FILE,
+                     stream: bool = True, buffer_size: int = STREAM_BUFFER_SIZE, fresh: bool = False,
+                     compress: bool = False, decode_workers: int = 0, conditional: bool = True):
     """
-    Основная функция для загрузки URL из файла и сохранения результатов
+    Основная функция для загрузки URL из input_file и сохранения результатов в output_file.
+    Загрузка возобновляемая: URL из журнала (успешные и окончательно неудачные) пропускаются,
+    результаты дописываются в конец файла. fresh=True - начать с нуля.
+    Результаты пишет отдельная стадия ResultWriter пачками; compress=True - в output_file + ".gz".
+    decode_workers > 0 без потокового режима - число процессов для разбора больших ответов.
+    conditional=True (без сжатия) - условные запросы по валидаторам прошлого прогона (ValidatorStore).
     """
-    input_file = "../data/urls.txt"
-    output_file = "../data/results.jsonl"
+    if compress:
+        output_file += ".gz"
+    journal = CrawlJournal(output_file + ".journal")
+    store = ValidatorStore(output_file) if conditional and not compress else None
+
+    if fresh:
+        if store is not None:
+            store.rotate()
+        journal.reset(output_file)
+    journal.recover(output_file)
+    if store is not None:
+        store.load()
 
-    # Проверяем существование входного файла
+    # Файл только подсчитываем, сами URL читаются лениво по ходу загрузки; повторы URL пропускаются
     try:
-        with open(input_file, 'r', encoding='utf-8') as file:
-            urls = [line.strip() for line in file if line.strip()]
+        total = 0
+        pending = 0
+        for url in iter_unique_urls(input_file):
+            total += 1
+            pending += url not in journal.finished
     except FileNotFoundError:
         logger.error(f"Файл {input_file} не найден!")
         return
@@ -65,39 +275,103 @@ async def fetch_urls():
         logger.error(f"Ошибка чтения файла {input_file}: {str(e)}")
         return
 
-    if not urls:
+    if not total:
         logger.error("Файл с URL пуст!")
         return
 
-    logger.info(f"Найдено URL для обработки: {len(urls)}")
+    logger.info(f"Найдено URL для обработки: {total}")
+    if journal.finished:
+        logger.info(f"Продолжаем прошлую загрузку: уже обработано {len(journal.finished)} URL "
+                    f"(успешно {journal.done_count}, с ошибкой {journal.failed_count})")
+    logger.info(f"Осталось загрузить: {pending}")
 
-    # Ограничиваем количество одновременных запросов
-    semaphore = asyncio.Semaphore(5)
     success_count = 0
 
-    async with ClientSession() as session:
-        # Создаем задачи для каждого URL
-        tasks = [fetch_single_url(session, url, semaphore) for url in urls]
-
-        # Открываем файл для записи результатов
-        with open(output_file, 'w', encoding='utf-8') as result_file:
-            # Обрабатываем результаты по мере их поступления
-            for future_result in asyncio.as_completed(tasks):
-                result = await future_result
-                if result is not None:
-                    result_file.write(json.dumps(result, ensure_ascii=False) + '\n')
-                    result_file.flush()  # Сбрасываем буфер после каждой записи
-                    success_count += 1
-                    if success_count % 100 == 0:  # Логируем каждые 100 успешных запросов
-                        logger.info(f"Обработано: {success_count}/{len(urls)}")
-
-    logger.info(f"Завершено! Успешно обработано URL: {success_count} из {len(urls)}")
+    def commit(entries):
+        # Вызывается потоком записи, когда пачка уже сброшена в файл результатов
+        journal.record_batch([(CrawlJournal.DONE if written else CrawlJournal.FAILED, url, offset)
+                              for url, written, offset, _ in entries])
+        if store is not None:
+            store.commit(entries)
+
+    limiter = HostLimiter(CONCURRENCY, initial=HOST_CONCURRENCY, max_limit=MAX_HOST_CONCURRENCY)
+    breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_OPEN_TIMEOUT)
+    budget = RetryBudget(RETRY_BUDGET_RATIO)
+
+    decode_pool = ProcessPoolExecutor(decode_workers) if decode_workers and not stream else None
+
+    journal.open()
+    if store is not None:
+        store.open()
+    try:
+        async with ClientSession(connector=make_connector(CONCURRENCY, MAX_HOST_CONCURRENCY)) as session:
+            async def fetch_tagged(item: tuple):
+                # Результаты приходят не по порядку - возвращаем URL вместе с результатом для журнала
+                url, attempt = item
+                result = await fetch_with_retries(session, url, limiter, breaker, budget, stream, buffer_size,
+                                                  decode_pool, store, attempt)
+                return result if isinstance(result, Retry) else (url, result)
+
+            # (URL, номер попытки): повтор возвращается в очередь с attempt + 1
+            urls = ((url, 0) for url in iter_unique_urls(input_file, journal.finished))
+
+            # Дописываем результаты после последней подтверждённой записи
+            async with ResultWriter(output_file, append=True, compress=compress, on_commit=commit,
+                                    checksums=store is not None) as writer:
+                # Обрабатываем результаты по мере их поступления
+                async for url, result in map_bounded(fetch_tagged, urls, WORKERS):
+                    if result is FAILED:
+                        await writer.put(url, None)
+                    elif result is not None:
+                        await writer.put(url, result)
+                        success_count += 1
+                        if success_count % 100 == 0:  # Логируем каждые 100 успешных запросов
+                            logger.info(f"Обработано: {success_count}/{pending}")
+    finally:
+        journal.close()
+        if store is not None:
+            store.close()
+        if decode_pool is not None:
+            decode_pool.shutdown(cancel_futures=True)
+
+    logger.info(f"Завершено! Успешно обработано URL: {success_count} из {pending}")
+    logger.info(f"Повторов: {budget.retries} (не хватило бюджета: {budget.exhausted}); "
+                f"срабатываний предохранителя: {breaker.trips}, отложено URL: {breaker.rejected}")
+    if store is not None and store.not_modified:
+        logger.info(f"Не изменились с прошлого прогона (304): {store.not_modified} URL, "
+                    f"скопировано {store.reused_bytes} байт без загрузки")
+    if breaker.open_hosts():
+        logger.info(f"Недоступные хосты: {', '.join(breaker.open_hosts())}")
+    if limiter.backoffs():
+        logger.info(f"Снижений лимита из-за 429/5xx/таймаутов/задержки: {limiter.backoffs()}; "
+                    f"лимиты хостов: {limiter.limits()}")
     logger.info(f"Результаты сохранены в: {output_file}")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Загрузка JSON по списку URL")
+    parser.add_argument("--input", default=INPUT_FILE, help="файл со списком URL")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="файл результатов JSONL")
+    parser.add_argument("--log-file", default=LOG_FILE, help="файл лога (пустая строка - только stdout)")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    parser.add_argument("--no-stream", action="store_true",
+                        help="разбирать ответ целиком через response.json() вместо потокового режима")
+    parser.add_argument("--buffer-size", type=int, default=STREAM_BUFFER_SIZE,
+                        help="размер порции чтения в потоковом режиме, байт")
+    parser.add_argument("--fresh", action="store_true",
+                        help="начать загрузку заново, не продолжая прошлую по журналу")
+    parser.add_argument("--gzip", action="store_true",
+                        help="сжимать результаты (OUTPUT.gz)")
+    parser.add_argument("--decode-workers", type=int, default=0,
+                        help=f"с --no-stream: разбирать ответы больше {DECODE_THRESHOLD} байт в стольких процессах")
+    parser.add_argument("--no-conditional", action="store_true",
+                        help="не отправлять условные запросы по валидаторам прошлого прогона")
+    args = parser.parse_args()
+    setup_logging(args.log_file, getattr(logging, args.log_level))
     try:
-        asyncio.run(fetch_urls())
+        asyncio.run(fetch_urls(args.input, args.output, stream=not args.no_stream, buffer_size=args.buffer_size,
+                               fresh=args.fresh, compress=args.gzip, decode_workers=args.decode_workers,
+                               conditional=not args.no_conditional))
     except KeyboardInterrupt:
         logger.info("Работа прервана пользователем")
     except Exception as e:
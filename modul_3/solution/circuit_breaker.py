@@ -0,0 +1,92 @@
+import random
+import time
+
+from host_limiter import host_of
+
+
+class _Circuit:
+    def __init__(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для хостов, которые не отвечают.
+
+    После threshold подряд неудачных подключений (таймаут, ошибка соединения или DNS)
+    хост "размыкается": allow() для его URL сразу возвращает False, не занимая место
+    в лимитах и не дожидаясь таймаута. Через open_timeout секунд пропускается один
+    пробный запрос (полуоткрытое состояние): успех замыкает цепь, неудача снова размыкает.
+    """
+
+    def __init__(self, threshold: int = 5, open_timeout: float = 30.0):
+        self.threshold = threshold
+        self.open_timeout = open_timeout
+        self.trips = 0
+        self.rejected = 0
+        self._circuits = {}
+
+    def allow(self, url: str) -> bool:
+        circuit = self._circuits.get(host_of(url))
+        if circuit is None or circuit.opened_at is None:
+            return True
+        if not circuit.probing and time.monotonic() - circuit.opened_at >= self.open_timeout:
+            circuit.probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def is_open(self, url: str) -> bool:
+        circuit = self._circuits.get(host_of(url))
+        return circuit is not None and circuit.opened_at is not None
+
+    def record(self, url: str, reachable: bool):
+        """Итог запроса, пропущенного allow(): reachable - был ли получен ответ от хоста"""
+        host = host_of(url)
+        circuit = self._circuits.get(host)
+        if reachable:
+            if circuit is not None:
+                del self._circuits[host]
+            return
+        if circuit is None:
+            circuit = self._circuits[host] = _Circuit()
+        circuit.failures += 1
+        if circuit.probing or (circuit.opened_at is None and circuit.failures >= self.threshold):
+            if not circuit.probing:
+                self.trips += 1
+            circuit.opened_at = time.monotonic()
+            circuit.probing = False
+
+    def open_hosts(self) -> list:
+        return [host for host, circuit in self._circuits.items() if circuit.opened_at is not None]
+
+
+class RetryBudget:
+    """
+    Общий бюджет повторов: не больше minimum + ratio * (число запросов) повторов за всю загрузку,
+    чтобы при массовых сбоях повторы не умножали нагрузку.
+    """
+
+    def __init__(self, ratio: float = 0.1, minimum: int = 10):
+        self.ratio = ratio
+        self.minimum = minimum
+        self.requests = 0
+        self.retries = 0
+        self.exhausted = 0
+
+    def request(self):
+        self.requests += 1
+
+    def take(self) -> bool:
+        if self.retries >= self.minimum + self.ratio * self.requests:
+            self.exhausted += 1
+            return False
+        self.retries += 1
+        return True
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Экспоненциальная задержка перед повтором с полным случайным разбросом (full jitter)"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
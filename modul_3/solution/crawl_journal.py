@@ -0,0 +1,74 @@
+import os
+
+
+class CrawlJournal:
+    """
+    Журнал завершённых URL для возобновления загрузки после остановки.
+
+    Каждая строка: "done|failed<TAB>offset<TAB>url", где offset - размер файла результатов
+    после обработки этого URL. Запись в журнал делается только после того, как строка
+    результата записана и сброшена на диск, поэтому всё, что в файле результатов лежит
+    дальше последнего offset из журнала, - незавершённые записи, их можно отрезать.
+    """
+
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.finished = set()
+        self.done_count = 0
+        self.failed_count = 0
+        self._file = None
+
+    def recover(self, output_file: str) -> int:
+        """
+        Читает журнал и обрезает файл результатов до последней подтверждённой записи.
+        Возвращает размер файла результатов, с которого продолжается запись.
+        """
+        offset = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    if not line.endswith('\n'):
+                        # Последняя строка журнала оборвалась вместе с процессом
+                        break
+                    status, end, url = line.rstrip('\n').split('\t', 2)
+                    self.finished.add(url)
+                    if status == self.DONE:
+                        self.done_count += 1
+                    else:
+                        self.failed_count += 1
+                    offset = max(offset, int(end))
+        except FileNotFoundError:
+            pass
+
+        # Без журнала прошлый результат не подтверждён - начинаем файл заново
+        with open(output_file, 'ab') as file:
+            file.truncate(offset)
+        return offset
+
+    def open(self):
+        # Обрезаем оборванную последнюю строку журнала, если она есть
+        if os.path.exists(self.path):
+            with open(self.path, 'rb+') as file:
+                data = file.read()
+                file.truncate(data.rfind(b'\n') + 1)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def record_batch(self, entries):
+        """Записывает пачку (status, url, offset) одной записью в файл"""
+        self._file.write(''.join(f"{status}\t{offset}\t{url}\n" for status, url, offset in entries))
+        self._file.flush()
+        self.finished.update(url for _, url, _ in entries)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def reset(self, output_file: str):
+        """Начать загрузку с нуля: удалить журнал и файл результатов"""
+        for path in (self.path, output_file):
+            if os.path.exists(path):
+                os.remove(path)
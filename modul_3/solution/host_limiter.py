@@ -0,0 +1,151 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+
+def host_of(url: str) -> str:
+    """Ключ хоста для лимитов: host:port из URL"""
+    return urlsplit(url).netloc.lower()
+
+
+def make_connector(global_limit: int, per_host_limit: int, dns_ttl: int = 300) -> aiohttp.TCPConnector:
+    """
+    Пул соединений под лимиты HostLimiter: общий и на хост, с кешем DNS,
+    чтобы тысячи URL одного хоста не резолвились заново.
+    """
+    return aiohttp.TCPConnector(limit=global_limit, limit_per_host=per_host_limit,
+                                use_dns_cache=True, ttl_dns_cache=dns_ttl)
+
+
+class _Host:
+    def __init__(self, limit: float):
+        self.limit = limit
+        self.in_flight = 0
+        self.cond = asyncio.Condition()
+        # Сглаженная задержка до заголовков ответа и лучшая из наблюдавшихся
+        self.latency = None
+        self.best_latency = None
+        self.last_decrease = 0.0
+        self.decreases = 0
+
+
+class _Slot:
+    """
+    async with limiter.slot(url) as slot: ... - место в лимите хоста и в общем лимите.
+    slot.response(status) сообщает статус и задержку до заголовков ответа;
+    таймаут и ошибка соединения, вылетевшие из блока (в том числе при чтении тела),
+    засчитываются как перегрузка.
+    """
+
+    def __init__(self, limiter: "HostLimiter", host: _Host):
+        self._limiter = limiter
+        self._host = host
+        self._started = None
+
+    async def __aenter__(self) -> "_Slot":
+        await self._limiter._acquire(self._host)
+        self._started = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is not None and issubclass(exc_type, (asyncio.TimeoutError, aiohttp.ClientError)):
+                self.failed()
+        finally:
+            await self._limiter._release(self._host)
+
+    def response(self, status: int):
+        latency = time.monotonic() - self._started
+        if status == 429 or status >= 500:
+            self._limiter._decrease(self._host)
+        else:
+            self._limiter._on_success(self._host, latency)
+
+    def failed(self):
+        self._limiter._decrease(self._host)
+
+
+class HostLimiter:
+    """
+    Адаптивное ограничение числа одновременных запросов к каждому хосту (AIMD).
+
+    Пока хост отвечает быстро, его лимит растёт примерно на 1 за "круг" запросов
+    (+1/limit на каждый успешный ответ), до max_limit. На 429, 5xx, таймауте или ошибке
+    соединения, а также если задержка выросла больше чем в latency_factor раз и хотя бы
+    на latency_slack секунд относительно лучшей, лимит умножается на backoff
+    (не чаще раза в cooldown секунд и не чаще раза за время ответа хоста).
+    Поверх лимитов хостов действует общий лимит global_limit на все запросы.
+    """
+
+    def __init__(self, global_limit: int, initial: int = 2, min_limit: int = 1, max_limit: int = 10,
+                 backoff: float = 0.5, latency_factor: float = 3.0, latency_slack: float = 0.1,
+                 cooldown: float = 0.5):
+        self.global_limit = global_limit
+        self.initial = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_factor = latency_factor
+        self.latency_slack = latency_slack
+        self.cooldown = cooldown
+        self.hosts = {}
+        self._global = asyncio.Semaphore(global_limit)
+
+    def slot(self, url: str) -> _Slot:
+        return _Slot(self, self._host(url))
+
+    def limits(self) -> dict:
+        """Текущие лимиты хостов (для отчёта)"""
+        return {name: int(host.limit) for name, host in self.hosts.items()}
+
+    def backoffs(self) -> int:
+        return sum(host.decreases for host in self.hosts.values())
+
+    def _host(self, url: str) -> _Host:
+        name = host_of(url)
+        host = self.hosts.get(name)
+        if host is None:
+            host = self.hosts[name] = _Host(self.initial)
+        return host
+
+    async def _acquire(self, host: _Host):
+        async with host.cond:
+            await host.cond.wait_for(lambda: host.in_flight < int(host.limit))
+            host.in_flight += 1
+        try:
+            await self._global.acquire()
+        except BaseException:
+            await self._release_host(host)
+            raise
+
+    async def _release(self, host: _Host):
+        self._global.release()
+        await self._release_host(host)
+
+    @staticmethod
+    async def _release_host(host: _Host):
+        async with host.cond:
+            host.in_flight -= 1
+            host.cond.notify(max(int(host.limit) - host.in_flight, 0))
+
+    def _on_success(self, host: _Host, latency: float):
+        host.latency = latency if host.latency is None else 0.8 * host.latency + 0.2 * latency
+        if host.best_latency is None or latency < host.best_latency:
+            host.best_latency = latency
+        threshold = max(host.best_latency * self.latency_factor, host.best_latency + self.latency_slack)
+        if host.latency > threshold:
+            self._decrease(host)
+        else:
+            # Ждущие запросы разбудит освобождение этого же места (_release_host) уже с новым лимитом
+            host.limit = min(host.limit + 1 / host.limit, self.max_limit)
+
+    def _decrease(self, host: _Host):
+        now = time.monotonic()
+        # Ответы на запросы, отправленные до прошлого снижения, не должны снижать лимит ещё раз
+        if now - host.last_decrease < max(self.cooldown, host.latency or 0):
+            return
+        host.last_decrease = now
+        host.limit = max(host.limit * self.backoff, self.min_limit)
+        host.decreases += 1
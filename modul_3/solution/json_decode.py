@@ -0,0 +1,42 @@
+import io
+import json
+import os
+import tempfile
+
+
+class TempRecordFile(io.FileIO):
+    """Временный файл с готовой строкой JSONL; удаляется при закрытии (его закрывает ResultWriter)"""
+
+    def __init__(self, path: str):
+        super().__init__(path, 'rb')
+
+    def close(self):
+        if not self.closed:
+            super().close()
+            os.remove(self.name)
+
+
+def decode_to_record(body_path: str, url: str) -> str:
+    """
+    Выполняется в процессе ProcessPoolExecutor: разбирает JSON из файла body_path и
+    записывает строку JSONL {"url": ..., "content": ...} во временный файл, возвращает его путь.
+    Между процессами передаются только пути, а не сам документ (без pickle больших строк).
+    При невалидном JSON бросает ValueError только с текстом ошибки.
+    """
+    with open(body_path, 'rb') as file:
+        try:
+            data = json.load(file)
+        except ValueError as e:
+            # JSONDecodeError.doc и UnicodeDecodeError.object - весь документ: исключение
+            # вернулось бы в основной процесс через pickle вместе с ним
+            raise ValueError(str(e)) from None
+    fd, record_path = tempfile.mkstemp(suffix='.jsonl')
+    try:
+        with open(fd, 'w', encoding='utf-8') as file:
+            # json.dumps, а не json.dump: только он использует C-кодировщик целиком
+            file.write(json.dumps({"url": url, "content": data}, ensure_ascii=False))
+            file.write('\n')
+    except BaseException:
+        os.remove(record_path)
+        raise
+    return record_path
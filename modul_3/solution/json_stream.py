@@ -0,0 +1,263 @@
+import codecs
+import json
+import json.scanner
+import re
+
+
+# Пробелы между токенами
+_WS = re.compile(r'[ \t\n\r]*')
+# Участок строки без кавычки, обратного слеша и управляющих символов
+_STRING_RUN = re.compile(r'[^"\\\x00-\x1f]*')
+_ESCAPE = re.compile(r'\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4})')
+_NUMBER_CHARS = re.compile(r'[0-9+\-.eE]*')
+# Незаконченный скаляр (число, литерал, escape) ждёт следующей порции, но не дольше этого
+_MAX_TOKEN = 4096
+# Перевод строки в валидном JSON возможен только вне строк, поэтому его можно заменить пробелом
+_NEWLINES_TO_SPACES = bytes.maketrans(b'\r\n', b'  ')
+# Наибольшая вложенность контейнеров, по которым парсер спускается сам (с запасом меньше предела
+# рекурсии). Глубже, как и при RecursionError в C-сканере, документ отклоняется: json.loads его не разберёт
+MAX_DEPTH = 256
+# Сколько длин порции C-сканер может пройти впустую (по обрезанным контейнерам) за одну порцию.
+# Дальше контейнеры разбираются без него: на глубокой обрезанной вложенности каждый уровень
+# сканировал бы порцию заново
+_FAILED_SCANS_PER_CHUNK = 4
+
+# Что парсер ожидает дальше
+VALUE, VALUE_OR_END, KEY, KEY_OR_END, COLON, COMMA_OR_END, DONE = range(7)
+
+
+class JsonStreamValidator:
+    """
+    Потоковая проверка синтаксиса JSON-документа, который приходит частями.
+
+    Каждое значение, целиком попавшее в буфер, проверяется C-сканером модуля json;
+    по контейнерам, которые не поместились в буфер, парсер спускается сам.
+    Память ограничена размером порции: хранится только стек вложенности и
+    незаконченный хвост предыдущей порции. При ошибке feed/close бросают ValueError.
+    """
+
+    def __init__(self):
+        self.stack = []
+        self.expect = VALUE
+        # Сколько символов документа уже разобрано (для сообщений об ошибках)
+        self.offset = 0
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._scan_once = json.scanner.make_scanner(json.JSONDecoder())
+        self._buffer = ''
+        # Сколько символов ещё можно потратить на неудачные вызовы C-сканера в текущей порции
+        self._scan_budget = 0
+        self._in_string = False
+        self._string_is_key = False
+
+    @staticmethod
+    def to_line(chunk: bytes) -> bytes:
+        """Порция документа для записи в одну строку JSONL"""
+        return chunk.translate(_NEWLINES_TO_SPACES)
+
+    def feed(self, chunk: bytes):
+        self._parse(self._utf8.decode(chunk), final=False)
+
+    def close(self):
+        """Проверяет, что документ закончился; бросает ValueError, если он обрезан или пуст"""
+        self._parse(self._utf8.decode(b'', final=True), final=True)
+        if self._in_string or self._buffer or self.expect != DONE:
+            self._error("Документ JSON обрезан", len(self._buffer))
+
+    def _error(self, message: str, position: int):
+        raise ValueError(f"{message} (символ {self.offset + position})")
+
+    def _parse(self, text: str, final: bool):
+        text = self._buffer + text
+        i = self._scan(text, final)
+        self._buffer = text[i:]
+        self.offset += i
+
+    def _after_value(self):
+        self.expect = COMMA_OR_END if self.stack else DONE
+
+    def _scan(self, text: str, final: bool) -> int:
+        """Разбирает text, возвращает позицию, с которой нужно продолжить после следующей порции"""
+        n = len(text)
+        i = 0
+        self._scan_budget = _FAILED_SCANS_PER_CHUNK * n
+        # Глубины вложенности, для которых в этой порции уже пробовали _skip_members
+        bulk_tried = set()
+        while True:
+            if self._in_string:
+                i = self._skip_string(text, i, final)
+                if self._in_string:
+                    return i
+                continue
+
+            i = _WS.match(text, i).end()
+            if i == n:
+                return n
+            c = text[i]
+            expect = self.expect
+
+            # На границе элементов объекта или массива пробуем проверить их все сразу
+            at_member = expect in (KEY, KEY_OR_END) or (expect in (VALUE, VALUE_OR_END) and self.stack[-1:] == ['['])
+            if at_member and len(self.stack) not in bulk_tried:
+                bulk_tried.add(len(self.stack))
+                end = self._skip_members(text, i)
+                if end is not None:
+                    i = end
+                    self.expect = COMMA_OR_END
+                    continue
+
+            if expect in (KEY, KEY_OR_END):
+                if c == '}' and expect == KEY_OR_END:
+                    i = self._close_container(c, i)
+                elif c == '"':
+                    self._in_string, self._string_is_key = True, True
+                    i += 1
+                else:
+                    self._error("Ожидался ключ объекта", i)
+
+            elif expect in (VALUE, VALUE_OR_END):
+                if c == ']' and expect == VALUE_OR_END:
+                    i = self._close_container(c, i)
+                    continue
+                end = self._try_value(text, i, final)
+                if end is not None:
+                    i = end
+                    self._after_value()
+                elif c in '{[':
+                    # Контейнер не поместился в буфер (или в нём ошибка) - спускаемся внутрь
+                    if len(self.stack) == MAX_DEPTH:
+                        self._error(f"Вложенность больше {MAX_DEPTH}", i)
+                    self.stack.append(c)
+                    self.expect = KEY_OR_END if c == '{' else VALUE_OR_END
+                    i += 1
+                elif c == '"':
+                    self._in_string, self._string_is_key = True, False
+                    i += 1
+                elif final or n - i > _MAX_TOKEN:
+                    self._error("Ожидалось значение", i)
+                else:
+                    # Число или литерал обрезаны концом порции
+                    return i
+
+            elif expect == COLON:
+                if c != ':':
+                    self._error("Ожидалось ':'", i)
+                self.expect = VALUE
+                i += 1
+
+            elif expect == COMMA_OR_END:
+                if c == ',':
+                    self.expect = KEY if self.stack[-1] == '{' else VALUE
+                    i += 1
+                elif c in '}]':
+                    i = self._close_container(c, i)
+                else:
+                    self._error("Ожидалось ',' или конец объекта/массива", i)
+
+            else:
+                self._error("Лишние данные после документа JSON", i)
+
+    def _try_value(self, text: str, i: int, final: bool):
+        """Конец значения, начинающегося в i, или None, если оно не разбирается целиком"""
+        if not final and text[i] in '-0123456789':
+            # Число в конце порции может продолжиться в следующей
+            if _NUMBER_CHARS.match(text, i).end() == len(text):
+                return None
+        if self._scan_budget <= 0 and text[i] in '{[':
+            return None
+        try:
+            _, end = self._scan_once(text, i)
+        except (StopIteration, ValueError) as e:
+            self._scan_failed(e, i, len(text))
+            return None
+        except RecursionError:
+            self._error("Слишком глубокая вложенность", i)
+        self._check_depth(text, i, end, len(self.stack))
+        return end
+
+    def _scan_failed(self, e: Exception, start: int, end: int):
+        # StopIteration.value и JSONDecodeError.pos - где сканер остановился
+        stop = e.value if isinstance(e, StopIteration) else getattr(e, 'pos', None)
+        self._scan_budget -= (end if stop is None else stop) - start
+
+    def _check_depth(self, text: str, start: int, end: int, depth: int):
+        """
+        Проверенное сканером значение text[start:end] лежит внутри depth внешних контейнеров.
+        Если вместе с ними вложенность может превысить MAX_DEPTH, значение проверяется ещё раз
+        внутри depth скобок - так, как его увидит json.loads, - и при RecursionError документ отклоняется
+        """
+        if not depth or depth + text.count('[', start, end) + text.count('{', start, end) <= MAX_DEPTH:
+            return
+        try:
+            self._scan_once('[' * depth + text[start:end] + ']' * depth, 0)
+        except RecursionError:
+            self._error("Слишком глубокая вложенность", start)
+
+    def _skip_members(self, text: str, i: int):
+        """
+        Проверяет одним вызовом C-сканера все элементы текущего контейнера до запятой k:
+        '{' + text[i:k] + '}' разбирается, только если запятая k стоит на верхнем уровне
+        этого контейнера (а не внутри строки или вложенного значения).
+        Кандидаты - последняя запятая в буфере и последняя запятая после '}' или ']'
+        (для контейнеров из контейнеров). Возвращает k или None.
+
+        Внешние контейнеры стека добавляются вокруг, чтобы сканер видел полную вложенность,
+        как json.loads. Ближайший из них - другого типа, чем настоящий родитель: если text[i:k]
+        закрывает текущий контейнер раньше k, продолжение родителя в такой обёртке не разберётся.
+        """
+        if self._scan_budget <= 0:
+            return None
+        opening = self.stack[-1]
+        closing = '}' if opening == '{' else ']'
+        outer = len(self.stack) - 1
+        if outer:
+            parent = ('[', ']') if self.stack[-2] == '{' else ('{"":', '}')
+            opening = '[' * (outer - 1) + parent[0] + opening
+            closing = closing + parent[1] + ']' * (outer - 1)
+        last_comma = text.rfind(',', i)
+        after_container = max(text.rfind('},', i), text.rfind('],', i)) + 1
+        for k in dict.fromkeys((last_comma, after_container)):
+            if k <= i:
+                continue
+            members = opening + text[i:k] + closing
+            try:
+                _, end = self._scan_once(members, 0)
+            except (StopIteration, ValueError) as e:
+                self._scan_failed(e, 0, len(members))
+                continue
+            except RecursionError:
+                self._error("Слишком глубокая вложенность", i)
+            if end == len(members):
+                return k
+        return None
+
+    def _close_container(self, c: str, i: int) -> int:
+        opening = self.stack.pop() if self.stack else None
+        if (opening, c) not in (('{', '}'), ('[', ']')):
+            self._error("Непарная скобка", i)
+        self._after_value()
+        return i + 1
+
+    def _skip_string(self, text: str, i: int, final: bool) -> int:
+        n = len(text)
+        while True:
+            i = _STRING_RUN.match(text, i).end()
+            if i == n:
+                return n
+            c = text[i]
+            if c == '"':
+                self._in_string = False
+                if self._string_is_key:
+                    self.expect = COLON
+                else:
+                    self._after_value()
+                return i + 1
+            if c != '\\':
+                self._error("Управляющий символ внутри строки", i)
+            match = _ESCAPE.match(text, i)
+            if match:
+                i = match.end()
+            elif not final and n - i < 6:
+                # escape-последовательность обрезана концом порции
+                return i
+            else:
+                self._error("Некорректная escape-последовательность", i)
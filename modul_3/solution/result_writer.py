@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import json
+import zlib
+
+# Маркер закрытия очереди
+_CLOSE = object()
+
+
+class ResultWriter:
+    """
+    Отдельная стадия записи результатов в JSONL.
+
+    Загрузчики кладут записи в ограниченную очередь (put) и не ждут диск.
+    Фоновая задача собирает записи в пачки (до batch_size штук или flush_interval секунд)
+    и пишет каждую пачку в потоке (asyncio.to_thread) одним flush, а не write+flush на запись.
+
+    Запись - dict (сериализуется в строку JSON), bytes или файлоподобный объект с готовой строкой JSONL
+    (например, из stream_record) или None (писать нечего, но нужно подтвердить ключ - для журнала).
+    После записи пачки вызывается on_commit(entries) в потоке записи, где entries -
+    список (key, written, offset, span): offset - размер файла, до которого запись гарантированно цела,
+    span - (начало, длина, sha256) строки записи в файле или None (сжатие или нет записи).
+    sha256 считается только с checksums=True, иначе там None.
+
+    С compress=True каждая пачка пишется отдельным gzip-членом: файл читается как обычный .gz,
+    а обрезка по offset из on_commit оставляет его корректным.
+    """
+
+    def __init__(self, path: str, append: bool = False, compress: bool = False, on_commit=None,
+                 batch_size: int = 1000, flush_interval: float = 1.0, queue_size: int = 10000,
+                 compress_level: int = 6, checksums: bool = False):
+        self.path = path
+        self.append = append
+        self.compress = compress
+        self.compress_level = compress_level
+        self.checksums = checksums
+        self.on_commit = on_commit
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.batches = 0
+        self._queue = asyncio.Queue(queue_size)
+        self._file = None
+        self._task = None
+
+    async def __aenter__(self):
+        self._file = await asyncio.to_thread(open, self.path, 'ab' if self.append else 'wb', 1024 * 1024)
+        # Позиция конца файла считается сама, чтобы не спрашивать её у ОС на каждой записи
+        self._position = self._file.tell()
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            if not self._task.done():
+                await self._queue.put(_CLOSE)
+            await self._task
+        finally:
+            await asyncio.to_thread(self._file.close)
+
+    async def put(self, key, record):
+        if self._task.done():
+            self._closed()
+        if not self._queue.full():
+            self._queue.put_nowait((key, record))
+            return
+        # Очередь полна: ждём места, но не дольше, чем живёт стадия записи - упавшая стадия
+        # очередь уже не разберёт, и загрузчик ждал бы вечно
+        putter = asyncio.ensure_future(self._queue.put((key, record)))
+        try:
+            await asyncio.wait((putter, self._task), return_when=asyncio.FIRST_COMPLETED)
+        except BaseException:
+            putter.cancel()
+            raise
+        if putter.done():
+            return
+        putter.cancel()
+        self._closed()
+
+    def _closed(self):
+        # Стадия записи упала (например, нет места на диске) - сообщаем загрузчику
+        self._task.result()
+        raise RuntimeError("ResultWriter закрыт")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            item = await self._queue.get()
+            if item is _CLOSE:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size and not self._is_large(item):
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._queue.get_nowait()
+                if item is _CLOSE:
+                    closing = True
+                    break
+                batch.append(item)
+            await asyncio.to_thread(self._write_batch, batch)
+
+    @staticmethod
+    def _is_large(item) -> bool:
+        # Большую потоковую запись сбрасываем сразу, не дожидаясь остальных
+        return item is not _CLOSE and item[1] is not None and not isinstance(item[1], (dict, bytes))
+
+    def _write_batch(self, batch: list):
+        file = self._file
+        compressor = zlib.compressobj(self.compress_level, zlib.DEFLATED, 31) if self.compress else None
+        write = (lambda data: file.write(compressor.compress(data))) if compressor else file.write
+
+        entries = []
+        lines = []
+        position = self._position
+        for key, record in batch:
+            if record is None:
+                entries.append((key, False, None))
+                continue
+            start = position
+            digest = hashlib.sha256() if self.checksums else None
+            if isinstance(record, (dict, bytes)):
+                line = record if isinstance(record, bytes) else \
+                    (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+                lines.append(line)
+                position += len(line)
+                if digest:
+                    digest.update(line)
+            else:
+                if lines:
+                    write(b''.join(lines))
+                    lines = []
+                with record:
+                    while chunk := record.read(1024 * 1024):
+                        write(chunk)
+                        position += len(chunk)
+                        if digest:
+                            digest.update(chunk)
+            span = None if compressor else (start, position - start, digest.hexdigest() if digest else None)
+            entries.append((key, True, span))
+        if lines:
+            write(b''.join(lines))
+        if compressor:
+            file.write(compressor.flush())
+        file.flush()
+        self._position = position if not compressor else file.tell()
+        self.batches += 1
+
+        if self.on_commit is not None:
+            offset = self._position
+            self.on_commit([(key, written, offset, span) for key, written, span in entries])
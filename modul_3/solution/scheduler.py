@@ -0,0 +1,124 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Container, Iterable, Iterator, NamedTuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Маркер конца очереди
+_DONE = object()
+
+
+class Retry(NamedTuple):
+    """
+    Результат func для map_bounded: выполнить func(item) ещё раз через delay секунд.
+    Задержку выжидает отдельная задача, рабочая задача сразу берёт следующий элемент
+    """
+    item: Any
+    delay: float
+
+
+def iter_urls(file_path: str) -> Iterator[str]:
+    """Лениво читает URL из файла по одному, пропуская пустые строки"""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            url = line.strip()
+            if url:
+                yield url
+
+
+def iter_unique_urls(file_path: str, skip: Container[str] = ()) -> Iterator[str]:
+    """
+    iter_urls без повторов и без URL из skip (например, уже обработанных по журналу).
+    В памяти - только множество уже выданных URL, а не весь файл
+    """
+    seen = set()
+    for url in iter_urls(file_path):
+        if url not in seen and url not in skip:
+            seen.add(url)
+            yield url
+
+
+async def map_bounded(func: Callable[[T], Awaitable[R]], items: Iterable[T],
+                      concurrency: int = 5, queue_size: int = None) -> AsyncIterator[R]:
+    """
+    Выполняет await func(item) для элементов items в concurrency рабочих задачах
+    и отдаёт результаты по мере готовности.
+
+    items читается лениво и попадает к рабочим через очередь ограниченного размера,
+    поэтому в памяти одновременно находятся только concurrency выполняемых задач и
+    не больше queue_size элементов и результатов, сколько бы ни было items.
+    Количество рабочих задач и есть ограничение на число одновременных запросов.
+    Если func вернула Retry, элемент возвращается в очередь после задержки, а результатом
+    станет итог повторного вызова; пока идёт задержка, рабочая задача занята другими элементами.
+    Исключение из func останавливает всех рабочих и пробрасывается в цикл потребителя.
+    """
+    queue_size = queue_size or concurrency * 2
+    inbox = asyncio.Queue(queue_size)
+    outbox = asyncio.Queue(queue_size)
+    # Элементы, взятые из items и ещё без результата (в том числе ждущие повтора)
+    unfinished = 0
+    settled = asyncio.Event()
+    delayed = set()
+
+    async def produce():
+        nonlocal unfinished
+        for item in items:
+            unfinished += 1
+            await inbox.put(item)
+        # Рабочие нужны, пока не вернулись все отложенные повторы
+        while unfinished:
+            settled.clear()
+            await settled.wait()
+        for _ in range(concurrency):
+            await inbox.put(_DONE)
+
+    async def requeue(retry: Retry):
+        await asyncio.sleep(retry.delay)
+        await inbox.put(retry.item)
+
+    async def work():
+        nonlocal unfinished
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                return
+            result = await func(item)
+            if isinstance(result, Retry):
+                task = asyncio.create_task(requeue(result))
+                delayed.add(task)
+                task.add_done_callback(delayed.discard)
+                continue
+            await outbox.put(result)
+            unfinished -= 1
+            if not unfinished:
+                settled.set()
+
+    async def supervise():
+        tasks = [asyncio.create_task(produce())]
+        tasks += [asyncio.create_task(work()) for _ in range(concurrency)]
+        try:
+            await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            for task in tasks + list(delayed):
+                task.cancel()
+            raise
+        except BaseException:
+            for task in tasks + list(delayed):
+                task.cancel()
+            await outbox.put(_DONE)
+            raise
+        await outbox.put(_DONE)
+
+    supervisor = asyncio.create_task(supervise())
+    try:
+        while True:
+            result = await outbox.get()
+            if result is _DONE:
+                break
+            yield result
+        # Пробрасываем исключение рабочих, если оно было
+        await supervisor
+    finally:
+        if not supervisor.done():
+            supervisor.cancel()
+            await asyncio.gather(supervisor, return_exceptions=True)
@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import json
+import os
+
+# Записи из прошлого прогона меньше этого размера копируются через память, большие - потоком
+SMALL_RECORD = 64 * 1024
+
+
+class RecordSlice:
+    """Файлоподобное чтение length байт файла path начиная с offset (для ResultWriter)"""
+
+    def __init__(self, path: str, offset: int, length: int):
+        self._file = open(path, 'rb')
+        self._file.seek(offset)
+        self._left = length
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self._left:
+            size = self._left
+        data = self._file.read(size)
+        self._left -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ValidatorStore:
+    """
+    Условные запросы для повторных прогонов загрузки.
+
+    Для каждой записи результатов в файл output.validators пишется строка
+    {"url", "etag", "last_modified", "sha256", "offset", "length"}: валидаторы из ответа
+    и место записи в файле результатов. Новый прогон с нуля (rotate) переименовывает
+    результаты и валидаторы прошлого прогона в *.prev; по ним запросы уходят
+    с If-None-Match / If-Modified-Since, а на ответ 304 запись копируется из прошлых
+    результатов (после сверки sha256) без загрузки тела.
+    Работает только с несжатым файлом результатов: по смещениям в gzip строку не достать.
+    """
+
+    def __init__(self, output_file: str):
+        self.path = output_file + ".validators"
+        self.prev_output = output_file + ".prev"
+        self.prev_path = self.path + ".prev"
+        self.output_file = output_file
+        self.previous = {}
+        self.not_modified = 0
+        self.reused_bytes = 0
+        # Валидаторы ответов, чьи записи ещё не дошли до файла результатов
+        self._pending = {}
+        self._file = None
+
+    def rotate(self):
+        """Перед загрузкой с нуля: результаты текущего прогона становятся прошлыми"""
+        if os.path.exists(self.output_file) and os.path.exists(self.path):
+            os.replace(self.output_file, self.prev_output)
+            os.replace(self.path, self.prev_path)
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+
+    def load(self):
+        try:
+            with open(self.prev_path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Оборванная последняя строка
+                        continue
+                    self.previous[entry["url"]] = entry
+        except FileNotFoundError:
+            pass
+        if not os.path.exists(self.prev_output):
+            self.previous.clear()
+
+    def open(self):
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def conditional_headers(self, url: str) -> dict:
+        entry = self.previous.get(url)
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def remember(self, url: str, headers):
+        """Валидаторы ответа 200 или 304; сохраняются, когда запись окажется в файле (commit)"""
+        previous = self.previous.get(url, {})
+        self._pending[url] = (headers.get("ETag", previous.get("etag")),
+                              headers.get("Last-Modified", previous.get("last_modified")))
+
+    async def reuse(self, url: str):
+        """
+        Запись прошлого прогона для ответа 304: bytes для маленькой, RecordSlice для большой.
+        None, если её нет или она не совпала с sha256 - тогда URL нужно загрузить заново.
+        """
+        entry = self.previous.pop(url, None)
+        if entry is None:
+            return None
+        if not await asyncio.to_thread(self._verify, entry):
+            return None
+        self.not_modified += 1
+        self.reused_bytes += entry["length"]
+        if entry["length"] < SMALL_RECORD:
+            return await asyncio.to_thread(self._read_small, entry)
+        return RecordSlice(self.prev_output, entry["offset"], entry["length"])
+
+    def _verify(self, entry: dict) -> bool:
+        digest = hashlib.sha256()
+        try:
+            with RecordSlice(self.prev_output, entry["offset"], entry["length"]) as record:
+                while chunk := record.read(1024 * 1024):
+                    digest.update(chunk)
+        except OSError:
+            return False
+        return digest.hexdigest() == entry["sha256"]
+
+    def _read_small(self, entry: dict) -> bytes:
+        with RecordSlice(self.prev_output, entry["offset"], entry["length"]) as record:
+            return record.read()
+
+    def commit(self, entries):
+        """Вызывается потоком записи после журнала: запоминает, где лежат записанные строки"""
+        lines = []
+        for url, written, _, span in entries:
+            validators = self._pending.pop(url, None)
+            if not written or span is None or validators is None or not any(validators):
+                continue
+            start, length, sha256 = span
+            lines.append(json.dumps({"url": url, "etag": validators[0], "last_modified": validators[1],
+                                     "sha256": sha256, "offset": start, "length": length},
+                                    ensure_ascii=False) + '\n')
+        if lines:
+            self._file.write(''.join(lines))
+            self._file.flush()
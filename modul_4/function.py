@@ -1,7 +1,11 @@
 import json
+import math
 import random
+import struct
 import time
-from typing import List
+from typing import List, Sequence
+
+import numpy as np
 
 
 # Сохранение результатов в JSON
@@ -18,6 +22,133 @@ def save_results_to_json(filename: str, data: List[int], results: List[bool]):
             }
         }, f, indent=2)
 
+
+# Полное сохранение результатов в двоичном виде.
+# Файл: заголовок HEADER_SIZE байт, затем числа (int32, little-endian) и с границы 8 байт -
+# битовая маска простоты (бит i - число i, младший бит байта первым). Разделы лежат
+# по фиксированным смещениям, поэтому файл открывается через np.memmap без чтения целиком.
+RESULTS_MAGIC = b'PRIMES\x00\x01'
+RESULTS_VERSION = 1
+# magic, версия, размер числа, всего чисел, записано чисел, время создания (unix)
+RESULTS_HEADER = struct.Struct('<8sIIQQd')
+HEADER_SIZE = 64
+# По столько чисел save_results_binary переводит в массивы за раз
+BINARY_CHUNK_SIZE = 1 << 16
+
+
+def _binary_layout(count: int):
+    numbers_offset = HEADER_SIZE
+    bits_offset = numbers_offset + count * 4
+    bits_offset += -bits_offset % 8
+    return numbers_offset, bits_offset, bits_offset + (count + 7) // 8
+
+
+class BinaryResultsWriter:
+    """
+    Потоковая запись результатов: файл сразу создаётся нужного размера, а write(start, numbers, flags)
+    кладёт каждый участок на его место - участки могут приходить в любом порядке
+    (по мере готовности процессов), второй полной копии данных в памяти нет.
+    Число записанных чисел попадает в заголовок при закрытии.
+    """
+
+    def __init__(self, filename: str, count: int):
+        self.filename = filename
+        self.count = count
+        self.written = 0
+        numbers_offset, bits_offset, size = _binary_layout(count)
+        with open(filename, 'wb') as f:
+            f.truncate(size)
+        self._header(0)
+        # Пустой memmap создать нельзя
+        self._numbers = np.memmap(filename, np.dtype('<i4'), 'r+', numbers_offset, (count,)) if count else None
+        self._bits = np.memmap(filename, np.uint8, 'r+', bits_offset, ((count + 7) // 8,)) if count else None
+
+    def _header(self, written: int):
+        with open(self.filename, 'r+b') as f:
+            f.write(RESULTS_HEADER.pack(RESULTS_MAGIC, RESULTS_VERSION, 4, self.count, written, time.time()))
+
+    def write(self, start: int, numbers: Sequence[int], flags: Sequence[bool]):
+        if not len(numbers):
+            return
+        if len(numbers) != len(flags) or start < 0 or start + len(numbers) > self.count:
+            raise ValueError(f"Участок [{start}, {start + len(numbers)}) не помещается в {self.count} чисел")
+        self._numbers[start:start + len(numbers)] = numbers
+        flags = np.asarray(flags, dtype=bool)
+        bits = self._bits
+        # Неполные байты на краях участка дописываются побитно, остальное - np.packbits
+        head = min(-start % 8, len(flags))
+        body_end = head + (len(flags) - head) // 8 * 8
+        for i in [*range(head), *range(body_end, len(flags))]:
+            position = start + i
+            if flags[i]:
+                bits[position >> 3] |= 1 << (position & 7)
+            else:
+                bits[position >> 3] &= ~(1 << (position & 7)) & 0xFF
+        first_byte = (start + head) >> 3
+        bits[first_byte:first_byte + (body_end - head) // 8] = np.packbits(flags[head:body_end], bitorder='little')
+        self.written += len(numbers)
+
+    def close(self):
+        for array in (self._numbers, self._bits):
+            if array is not None:
+                array.flush()
+        self._numbers = self._bits = None
+        self._header(self.written)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class BinaryResults:
+    """Результаты из файла BinaryResultsWriter, отображённые в память (np.memmap, только чтение)"""
+
+    def __init__(self, filename: str):
+        with open(filename, 'rb') as f:
+            magic, version, item_size, count, written, created = RESULTS_HEADER.unpack(
+                f.read(RESULTS_HEADER.size))
+        if magic != RESULTS_MAGIC or version != RESULTS_VERSION or item_size != 4:
+            raise ValueError(f"{filename}: не файл результатов (или другая версия формата)")
+        numbers_offset, bits_offset, _ = _binary_layout(count)
+        self.metadata = {
+            'data_size': count,
+            # Меньше data_size, если запись оборвалась
+            'written': written,
+            'date': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created)),
+        }
+        self.numbers = np.memmap(filename, np.dtype('<i4'), 'r', numbers_offset, (count,)) if count else np.zeros(0, np.int32)
+        self.bits = np.memmap(filename, np.uint8, 'r', bits_offset, ((count + 7) // 8,)) if count else np.zeros(0, np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def is_prime(self, index: int) -> bool:
+        return bool(self.bits[index >> 3] >> (index & 7) & 1)
+
+    def flags(self, start: int = 0, stop: int = None) -> np.ndarray:
+        """Флаги простоты чисел [start, stop) - распаковываются только нужные байты"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return np.zeros(0, dtype=bool)
+        packed = self.bits[start >> 3:(stop + 7) >> 3]
+        shift = start & 7
+        return np.unpackbits(packed, bitorder='little')[shift:shift + stop - start].astype(bool)
+
+
+def save_results_binary(filename: str, data: Sequence[int], results: Sequence[bool],
+                        chunk_size: int = BINARY_CHUNK_SIZE):
+    """Все числа и результаты в двоичный файл (BinaryResultsWriter) участками по chunk_size"""
+    with BinaryResultsWriter(filename, len(data)) as writer:
+        for start in range(0, len(data), chunk_size):
+            writer.write(start, data[start:start + chunk_size], results[start:start + chunk_size])
+
+
+def load_results_binary(filename: str) -> BinaryResults:
+    return BinaryResults(filename)
+
+
 # Генерация тестовых данных
 def generate_data(n: int) -> List[int]:
     return [random.randint(1, 1000) for _ in range(n)]
@@ -32,6 +163,97 @@ def process_number(number: int) -> bool:
             return False
     return True
 
+# Векторная проверка на простоту: решето Эратосфена + выборка по индексам NumPy.
+# До SIEVE_LIMIT - одна таблица простоты (байт на число), выше - сегментированное решето
+SIEVE_LIMIT = 10_000_000
+SEGMENT_SIZE = 1 << 20
+# С этого числа значений в сегменте его дешевле просеять, чем делить значения по одному
+DENSE_SEGMENT = 1024
+
+_prime_table = np.zeros(0, dtype=bool)
+
+
+def prime_table(limit: int) -> np.ndarray:
+    """Таблица is_prime[0..limit] (решето Эратосфена); переиспользуется между вызовами"""
+    global _prime_table
+    if len(_prime_table) <= limit:
+        # Растим с запасом, чтобы не пересчитывать решето на каждом чуть большем максимуме
+        size = max(limit + 1, min(2 * len(_prime_table), SIEVE_LIMIT + 1), 1024)
+        table = np.ones(size, dtype=bool)
+        table[:2] = False
+        for p in range(2, math.isqrt(size - 1) + 1):
+            if table[p]:
+                table[p * p::p] = False
+        _prime_table = table
+    return _prime_table
+
+
+def _segmented_is_prime(values: np.ndarray) -> np.ndarray:
+    """
+    Простота values > SIEVE_LIMIT по простым до sqrt(max).
+    Сегменты длиной SEGMENT_SIZE, где чисел много, просеиваются целиком (сегментированное решето);
+    редкие числа из остальных сегментов проверяются делением сразу всего массива на каждое простое.
+    """
+    base_primes = np.flatnonzero(prime_table(math.isqrt(int(values.max()))))
+    result = np.zeros(len(values), dtype=bool)
+    segments = values // SEGMENT_SIZE
+    order = np.argsort(segments, kind='stable')
+    unique, starts, counts = np.unique(segments[order], return_index=True, return_counts=True)
+
+    sparse = []
+    for segment, begin, count in zip(unique.tolist(), starts.tolist(), counts.tolist()):
+        indices = order[begin:begin + count]
+        if count < DENSE_SEGMENT:
+            sparse.append(indices)
+            continue
+        low = segment * SEGMENT_SIZE
+        high = low + SEGMENT_SIZE
+        mask = np.ones(SEGMENT_SIZE, dtype=bool)
+        for p in base_primes[base_primes * base_primes < high].tolist():
+            first = max(p * p, (low + p - 1) // p * p)
+            mask[first - low::p] = False
+        result[indices] = mask[values[indices] - low]
+
+    if sparse:
+        indices = np.concatenate(sparse)
+        candidates = values[indices]
+        largest = int(candidates.max())
+        for p in base_primes.tolist():
+            if p * p > largest:
+                break
+            # Все числа здесь больше SIEVE_LIMIT, поэтому делимость на p означает составное
+            keep = candidates % p != 0
+            if not keep.all():
+                indices, candidates = indices[keep], candidates[keep]
+                if not len(candidates):
+                    break
+                largest = int(candidates.max())
+        result[indices] = True
+    return result
+
+
+def is_prime_array(numbers: Sequence[int]) -> np.ndarray:
+    """
+    Векторный аналог process_number для массива чисел: результат совпадает с
+    [process_number(n) for n in numbers], но вместо деления для каждого числа -
+    одна выборка из таблицы решета (для чисел > SIEVE_LIMIT - сегментированное решето).
+    """
+    values = np.asarray(numbers, dtype=np.int64)
+    result = np.zeros(values.shape, dtype=bool)
+    if values.size == 0:
+        return result
+    small = (values >= 2) & (values <= SIEVE_LIMIT)
+    if small.all():
+        return prime_table(int(values.max()))[values]
+    if small.any():
+        small_values = values[small]
+        result[small] = prime_table(int(small_values.max()))[small_values]
+    large = values > SIEVE_LIMIT
+    if large.any():
+        result[large] = _segmented_is_prime(values[large])
+    return result
+
+
 # АЛЬТЕРНАТИВНОЕ ИСПОЛЬЗОВАНИЕ С NUMPY
 # import numpy as np
 #
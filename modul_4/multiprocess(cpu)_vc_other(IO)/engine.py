@@ -0,0 +1,251 @@
+"""
+Движок параллельной обработки с автовыбором способа выполнения.
+
+    from engine import engine
+    results = engine.map(process_number, data)
+    print(engine.last_decision)
+
+Перед обработкой функция замеряется на небольшой выборке данных: время и доля
+процессорного времени на одно число. По ним и размеру данных выбирается:
+
+    inline  - в текущем потоке: работы мало, накладные расходы на передачу её превысят
+    thread  - пул потоков: функция в основном ждёт (ввод-вывод, функции без GIL)
+    process - пул процессов с подобранными числом процессов и chunksize
+    shared  - пул процессов и общая память: int32 на входе, bool на выходе, без pickle данных
+
+Пулы создаются при первом использовании и живут между вызовами (close() или выход из программы).
+"""
+import atexit
+import concurrent.futures
+import math
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+from typing import Callable, List, NamedTuple, Sequence
+
+import numpy as np
+
+
+# Сколько элементов замерять перед выбором
+SAMPLE_SIZE = 200
+# Работа короче этого (сек) выполняется в текущем потоке
+INLINE_SECONDS = 0.05
+# Меньше работы (сек) на процесс не выдаём: иначе пересылка дороже вычислений
+MIN_SECONDS_PER_WORKER = 0.05
+# Доля процессорного времени в замере, ниже которой функция считается ждущей (ввод-вывод)
+IO_BOUND_CPU_RATIO = 0.5
+# Целевое время обработки одной пачки в процессе (сек) и минимум пачек на процесс
+TARGET_CHUNK_SECONDS = 0.02
+CHUNKS_PER_WORKER = 4
+# С такого размера данных int32 -> bool выгоднее передавать через общую память
+SHARED_MIN_ITEMS = 100000
+
+INT32_MIN, INT32_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+class Decision(NamedTuple):
+    backend: str
+    workers: int
+    chunksize: int
+    items: int
+    # Замер на выборке: время на элемент и доля процессорного времени в нём
+    item_seconds: float
+    cpu_ratio: float
+    reason: str
+
+
+# Общая память, подключённая в процессе пула: (имя входа, имя выхода) -> SharedMemory.
+# Движок переиспользует одни и те же блоки между вызовами, поэтому подключение обычно одно
+_attached = {}
+
+
+def _attach(input_name: str, output_name: str):
+    key = (input_name, output_name)
+    if key not in _attached:
+        for shm in _attached.pop(next(iter(_attached), None), ()):
+            shm.close()
+        _attached[key] = (shared_memory.SharedMemory(name=input_name), shared_memory.SharedMemory(name=output_name))
+    return _attached[key]
+
+
+class _NotBoolResult(TypeError):
+    """func вернула не bool - результат нельзя положить в байты общей памяти без искажения"""
+
+
+def _as_int32(data: Sequence):
+    """Все данные как массив int32 или None, если среди них есть не целые числа или числа вне int32"""
+    try:
+        array = np.asarray(data)
+    except (ValueError, TypeError):
+        return None
+    # Числа больше int64 дают dtype object, дробные - float: такие данные не подходят
+    if array.ndim != 1 or array.dtype.kind not in 'iu':
+        return None
+    if array.size and (array.min() < INT32_MIN or array.max() > INT32_MAX):
+        return None
+    return array.astype(np.int32, copy=False)
+
+
+def _shared_slice(func: Callable, input_name: str, output_name: str, offset: int, length: int):
+    input_shm, output_shm = _attach(input_name, output_name)
+    numbers = np.ndarray((offset + length,), dtype=np.int32, buffer=input_shm.buf)[offset:].tolist()
+    results = np.array([func(num) for num in numbers])
+    if results.dtype != np.bool_:
+        raise _NotBoolResult(f"func вернула {results.dtype}, а не bool")
+    flags = np.ndarray((offset + length,), dtype=np.bool_, buffer=output_shm.buf)
+    flags[offset:] = results
+    # Представление должно быть освобождено до закрытия общей памяти
+    del flags
+
+
+class Engine:
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self.last_decision = None
+        # Один тёплый пул процессов на число процессов последнего вызова
+        self._processes = None
+        self._process_count = 0
+        self._threads = None
+        self._input_shm = None
+        self._output_shm = None
+
+    def decide(self, func: Callable, data: Sequence) -> Decision:
+        """Замер на выборке и выбор способа выполнения, без обработки всех данных"""
+        return self._decide(func, data)[0]
+
+    def _decide(self, func: Callable, data: Sequence):
+        # Вместе с решением - данные в int32, если для shared они уже проверены целиком
+        items = len(data)
+        step = max(1, items // SAMPLE_SIZE)
+        sample = data[::step][:SAMPLE_SIZE]
+        cpu_start = time.thread_time()
+        start = time.perf_counter()
+        outputs = [func(item) for item in sample]
+        elapsed = time.perf_counter() - start
+        cpu = time.thread_time() - cpu_start
+
+        item_seconds = elapsed / len(sample) if sample else 0.0
+        cpu_ratio = min(1.0, cpu / elapsed) if elapsed > 0 else 1.0
+        total = item_seconds * items
+
+        def decision(backend, workers, chunksize, reason, numbers=None):
+            return Decision(backend, workers, chunksize, items, item_seconds, round(cpu_ratio, 2), reason), numbers
+
+        if total < INLINE_SECONDS:
+            return decision("inline", 1, items, f"оценка {total:.3f} сек < {INLINE_SECONDS} сек")
+        if cpu_ratio < IO_BOUND_CPU_RATIO:
+            workers = min(items, self._thread_workers())
+            return decision("thread", workers, 1, f"процессорное время {cpu_ratio:.0%} от общего - функция ждёт")
+
+        workers = min(self.max_workers, math.ceil(total / MIN_SECONDS_PER_WORKER))
+        if workers <= 1:
+            return decision("inline", 1, items, "доступен один процесс" if self.max_workers == 1
+                            else f"оценка {total:.3f} сек - на второй процесс работы не хватит")
+        chunksize = max(1, min(int(TARGET_CHUNK_SECONDS / max(item_seconds, 1e-9)),
+                               math.ceil(items / (workers * CHUNKS_PER_WORKER))))
+        reason = f"оценка {total:.2f} сек на {workers} процесс(ов), пачка ~{chunksize * item_seconds * 1000:.1f} мс"
+        # Выборка отсеивает неподходящие функции дёшево, но входные данные проверяются целиком:
+        # число вне выборки (дробное, больше int32) исказилось бы при копировании в int32
+        if items >= SHARED_MIN_ITEMS and all(type(output) is bool for output in outputs):
+            numbers = _as_int32(data)
+            if numbers is not None:
+                return decision("shared", workers, chunksize, reason + "; int32 -> bool через общую память", numbers)
+            reason += "; не все данные - int32, без общей памяти"
+        return decision("process", workers, chunksize, reason)
+
+    def map(self, func: Callable, data: Sequence, backend: str = None) -> List:
+        """
+        Аналог list(map(func, data)). func для процессов должна передаваться pickle
+        (функция уровня модуля), для shared - принимать int и возвращать bool.
+        backend - выполнить указанным способом вместо автовыбора.
+        """
+        decision, numbers = self._decide(func, data)
+        if backend is not None and backend != decision.backend:
+            workers = {"inline": 1, "thread": self._thread_workers()}.get(
+                backend, decision.workers if decision.workers > 1 else self.max_workers)
+            chunksize = max(1, math.ceil(len(data) / (workers * CHUNKS_PER_WORKER)))
+            decision = decision._replace(backend=backend, workers=workers, chunksize=chunksize,
+                                         reason=f"задано явно ({decision.reason})")
+        if decision.backend == "shared":
+            if numbers is None:
+                numbers = _as_int32(data)
+            if numbers is None:
+                decision = decision._replace(backend="process", reason=decision.reason + "; данные не int32")
+        self.last_decision = decision
+
+        if decision.backend == "inline":
+            return [func(item) for item in data]
+        if decision.backend == "thread":
+            if self._threads is None:
+                self._threads = concurrent.futures.ThreadPoolExecutor(self._thread_workers())
+            return list(self._threads.map(func, data))
+        if decision.backend == "shared":
+            try:
+                return self._map_shared(func, numbers, decision)
+            except _NotBoolResult:
+                # Выборка вернула bool, а остальные данные - нет: считаем заново без общей памяти
+                self.last_decision = decision = decision._replace(
+                    backend="process", reason=decision.reason + "; func вернула не bool - без общей памяти")
+        return self._pool(decision.workers).map(func, data, chunksize=decision.chunksize)
+
+    def _thread_workers(self) -> int:
+        # Как по умолчанию в ThreadPoolExecutor
+        return min(32, self.max_workers + 4)
+
+    def _pool(self, workers: int):
+        # Пул с другим числом процессов закрывается, а не копится рядом с новым
+        if self._processes is not None and self._process_count != workers:
+            self._close_processes()
+        if self._processes is None:
+            self._processes = multiprocessing.Pool(workers)
+            self._process_count = workers
+        return self._processes
+
+    def _close_processes(self):
+        if self._processes is not None:
+            self._processes.terminate()
+            self._processes.join()
+            self._processes = None
+
+    def _map_shared(self, func: Callable, data: np.ndarray, decision: Decision) -> List[bool]:
+        size = len(data)
+        if self._input_shm is None or self._output_shm.size < size:
+            self._release_shared()
+            capacity = max(size, SHARED_MIN_ITEMS)
+            self._input_shm = shared_memory.SharedMemory(create=True, size=capacity * 4)
+            self._output_shm = shared_memory.SharedMemory(create=True, size=capacity)
+        numbers = np.ndarray((size,), dtype=np.int32, buffer=self._input_shm.buf)
+        flags = np.ndarray((size,), dtype=np.bool_, buffer=self._output_shm.buf)
+        try:
+            numbers[:] = data
+            slices = [(func, self._input_shm.name, self._output_shm.name, offset, min(decision.chunksize, size - offset))
+                      for offset in range(0, size, decision.chunksize)]
+            self._pool(decision.workers).starmap(_shared_slice, slices)
+            return flags.tolist()
+        finally:
+            del numbers, flags
+
+    def _release_shared(self):
+        for shm in (self._input_shm, self._output_shm):
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+        self._input_shm = self._output_shm = None
+
+    def close(self):
+        self._close_processes()
+        if self._threads is not None:
+            self._threads.shutdown()
+            self._threads = None
+        self._release_shared()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Общий движок: пулы прогреваются один раз на всю программу
+engine = Engine()
+atexit.register(engine.close)
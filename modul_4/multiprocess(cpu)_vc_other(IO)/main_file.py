@@ -1,83 +1,386 @@
-import os
+"""
+Бенчмарк вариантов параллельной проверки чисел на простоту.
+
+Каждая точка (вариант, размер данных, число процессов/потоков) замеряется в отдельном
+процессе: сначала прогревочные запуски, затем несколько замеров - в отчёт идут медиана
+и межквартильный размах (IQR), процессорное время (вместе с дочерними процессами)
+и пиковая память. Наборы замеров:
+
+    sizes  - все варианты на каждом размере из --sizes
+    strong - сильное масштабирование: фиксированный размер, растёт число процессов
+    weak   - слабое масштабирование: на каждый процесс по --weak-size чисел
+    chunks - Process+Queue с разными размерами пачек
+
+Результаты пишутся в results/benchmark.json и results/benchmark_runs.csv. С --baseline
+медианы сравниваются с сохранённым прогоном (если файла нет - он создаётся из текущего),
+при регрессии код возврата 1. Графики (--plot) строятся, только если установлен matplotlib.
 
+    python main_file.py --sizes 10000 100000 1000000 --repeats 5 --baseline results/baseline.json --plot
+"""
+import argparse
 import csv
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
 import time
-import matplotlib.pyplot as plt
-from modul_4.function import generate_data, save_results_to_json
-from multiproc_concurrent_queue import process_with_queue, process_with_threads, process_with_pool, process_single_thread
+
+from modul_4.function import BinaryResultsWriter, generate_data, is_prime_array, load_results_binary, \
+    save_results_to_json
+from multiproc_concurrent_queue import process_with_queue, process_with_threads, process_with_pool, process_single_thread, \
+    process_vectorized, process_with_shared_memory, process_with_engine
+from engine import engine
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
 
 DATA_SIZE = 1000000
+# Размеры пачек для варианта Process+Queue
+QUEUE_CHUNK_SIZES = [100, 1000, 10000, 100000]
+# Сколько чисел на один процесс при слабом масштабировании
+WEAK_SIZE_PER_WORKER = 100000
+# Медиана хуже базовой больше чем на эту долю (и IQR не пересекаются) - регрессия
+REGRESSION_TOLERANCE = 0.1
+
+RESULTS_DIR = 'results'
+
+# Ключ для командной строки -> (название, функция, принимает ли число процессов/потоков)
+VARIANTS = {
+    "single": ("1. Однопоточный", process_single_thread, False),
+    "threads": ("2. ThreadPool (потоки)", process_with_threads, True),
+    "queue": ("3. Process+Queue", process_with_queue, True),
+    "pool": ("4. ProcessPool", process_with_pool, True),
+    "vectorized": ("5. NumPy + решето", process_vectorized, False),
+    "shared": ("6. Общая память", process_with_shared_memory, True),
+    "engine": ("7. Движок (автовыбор)", process_with_engine, False),
+}
+COLORS = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#88D8B0', '#FFD166', '#B39DDB', '#F4A261']
+
+
+def default_workers() -> list:
+    cpus = multiprocessing.cpu_count()
+    workers = {cpus}
+    n = 1
+    while n < cpus:
+        workers.add(n)
+        n *= 2
+    return sorted(workers)
+
+
+def peak_rss_mb(who):
+    if resource is None:
+        return None
+    rss = resource.getrusage(who).ru_maxrss
+    # Linux отдаёт килобайты, macOS - байты
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def quartiles(values: list):
+    if len(values) < 2:
+        return values[0], values[0]
+    q1, _, q3 = statistics.quantiles(values, n=4)
+    return q1, q3
+
+
+def measure(variant: str, size: int, workers: int, chunk_size: int, repeats: int, warmup: int) -> dict:
+    """Одна точка бенчмарка; выполняется в отдельном процессе (--run-one)"""
+    _, func, parallel = VARIANTS[variant]
+    kwargs = {}
+    if parallel and workers:
+        kwargs["workers"] = workers
+    if chunk_size:
+        kwargs["chunk_size"] = chunk_size
+
+    random.seed(size)
+    data = generate_data(size)
+    for _ in range(warmup):
+        func(data, **kwargs)
+
+    times = []
+    cpu_times = []
+    for _ in range(repeats):
+        before = os.times()
+        start_time = time.perf_counter()
+        result = func(data, **kwargs)
+        times.append(time.perf_counter() - start_time)
+        after = os.times()
+        # user + system своего процесса и завершившихся дочерних
+        cpu_times.append(sum(after[:4]) - sum(before[:4]))
+
+    median = statistics.median(times)
+    q1, q3 = quartiles(times)
+    cpu = statistics.median(cpu_times)
+    return {
+        "times": [round(t, 4) for t in times],
+        "median": round(median, 4),
+        "q1": round(q1, 4),
+        "q3": round(q3, 4),
+        "iqr": round(q3 - q1, 4),
+        "items_per_sec": round(size / median),
+        "cpu_seconds": round(cpu, 3),
+        # Сколько ядер в среднем было занято
+        "cpu_utilisation": round(cpu / median, 2),
+        "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+        "children_peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+        # Проверка после замеров, чтобы эталон не влиял на память
+        "ok": result == is_prime_array(data).tolist(),
+        # Что выбрал движок (прогрев держит его пулы запущенными к замерам)
+        "decision": engine.last_decision._asdict() if variant == "engine" else None,
+    }
+
+
+def run_one(variant: str, size: int, workers: int, chunk_size: int, repeats: int, warmup: int) -> dict:
+    """
+    Запускает точку в отдельном процессе: ru_maxrss и время дочерних процессов
+    относятся только к ней, а данные прошлых точек не занимают память
+    """
+    command = [sys.executable, os.path.abspath(__file__), "--run-one", variant, "--size", str(size),
+               "--repeats", str(repeats), "--warmup", str(warmup)]
+    if workers:
+        command += ["--run-workers", str(workers)]
+    if chunk_size:
+        command += ["--chunk-size", str(chunk_size)]
+    completed = subprocess.run(command, stdout=subprocess.PIPE, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{VARIANTS[variant][0]} (размер {size}) завершился с кодом {completed.returncode}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def plan(variants, modes, sizes, workers, strong_size, weak_size, chunk_sizes) -> list:
+    """Список точек: (набор, вариант, размер, процессы, размер пачки)"""
+    parallel = [v for v in variants if VARIANTS[v][2]]
+    points = []
+    if "sizes" in modes:
+        points += [("sizes", v, size, None, None) for size in sizes for v in variants]
+    if "strong" in modes:
+        points += [("strong", v, strong_size, w, None) for v in parallel for w in workers]
+    if "weak" in modes:
+        points += [("weak", v, weak_size * w, w, None) for v in parallel for w in workers]
+    if "chunks" in modes and "queue" in variants:
+        points += [("chunks", "queue", strong_size, None, c) for c in chunk_sizes]
+    return points
+
+
+def add_scaling(runs: list):
+    """Ускорение (strong) и эффективность (weak) относительно запуска с одним процессом"""
+    single = {(r["mode"], r["variant"]): r["median"] for r in runs
+              if r["mode"] in ("strong", "weak") and r["workers"] == 1}
+    for run in runs:
+        base = single.get((run["mode"], run["variant"]))
+        if base is None:
+            continue
+        if run["mode"] == "strong":
+            run["speedup"] = round(base / run["median"], 2)
+            run["efficiency"] = round(base / run["median"] / run["workers"], 2)
+        elif run["mode"] == "weak":
+            run["efficiency"] = round(base / run["median"], 2)
+
+
+def describe(run: dict) -> str:
+    if run["workers"]:
+        return f"процессов {run['workers']}"
+    return f"пачка {run['chunk_size']}" if run["chunk_size"] else ""
+
+
+def run_key(run: dict) -> tuple:
+    return run["mode"], run["variant"], run["size"], run["workers"], run["chunk_size"]
+
+
+def compare_with_baseline(runs: list, baseline: dict, tolerance: float) -> list:
+    """Регрессия - медиана хуже базовой больше чем на tolerance, и IQR не пересекаются"""
+    previous = {run_key(run): run for run in baseline["runs"]}
+    regressions = []
+    for run in runs:
+        base = previous.get(run_key(run))
+        if base is None:
+            continue
+        run["baseline_median"] = base["median"]
+        if run["median"] > base["median"] * (1 + tolerance) and run["q1"] > base["q3"]:
+            run["regression"] = True
+            regressions.append(run)
+    return regressions
+
+
+def write_csv(path: str, runs: list):
+    columns = ["mode", "name", "size", "workers", "chunk_size", "median", "q1", "q3", "iqr", "items_per_sec",
+               "cpu_seconds", "cpu_utilisation", "speedup", "efficiency", "peak_rss_mb", "children_peak_rss_mb",
+               "baseline_median", "regression", "ok"]
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(runs)
+
+
+def plot(runs: list, directory: str) -> list:
+    """Графики по наборам замеров; matplotlib импортируется только здесь"""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("⚠️ matplotlib не установлен - графики пропущены")
+        return []
+
+    colors = dict(zip(VARIANTS, COLORS))
+    charts = [
+        ("sizes", "size", "median", "Время от размера данных", "Размер данных", "Время, сек (медиана)", True),
+        ("strong", "workers", "speedup", "Сильное масштабирование", "Процессов/потоков", "Ускорение", False),
+        ("weak", "workers", "efficiency", "Слабое масштабирование", "Процессов/потоков", "Эффективность", False),
+        ("chunks", "chunk_size", "items_per_sec", "Process+Queue: размер пачки", "Размер пачки", "Чисел/сек", True),
+    ]
+    paths = []
+    for mode, x, y, title, xlabel, ylabel, log in charts:
+        selected = [run for run in runs if run["mode"] == mode and run.get(y) is not None]
+        if not selected:
+            continue
+        fig, ax = plt.subplots(figsize=(10, 6))
+        for variant in VARIANTS:
+            points = sorted((run[x], run[y], run["q1"], run["q3"]) for run in selected if run["variant"] == variant)
+            if not points:
+                continue
+            xs = [p[0] for p in points]
+            ax.plot(xs, [p[1] for p in points], marker='o', color=colors[variant], label=VARIANTS[variant][0])
+            if y == "median":
+                ax.fill_between(xs, [p[2] for p in points], [p[3] for p in points], color=colors[variant], alpha=0.2)
+        if log:
+            ax.set_xscale('log')
+            ax.set_yscale('log')
+        ax.set_title(title)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        ax.grid(linestyle='--', alpha=0.7)
+        ax.legend()
+        fig.tight_layout()
+        path = os.path.join(directory, f'benchmark_{mode}.png')
+        fig.savefig(path, dpi=120)
+        plt.close(fig)
+        paths.append(path)
+    return paths
 
 
 # Основная функция тестирования
-def benchmark():
-    data = generate_data(DATA_SIZE)
-    print(f"🔧 Сгенерировано {len(data)} тестовых чисел")
-
-    # Тестируемые методы
-    variants = {
-        "1. Однопоточный": process_single_thread,
-        "2. ThreadPool (потоки)": process_with_threads,
-        "3. Process+Queue": process_with_queue,
-        "4. ProcessPool": process_with_pool
+def benchmark(variants, modes, sizes, workers, repeats, warmup, strong_size, weak_size, chunk_sizes,
+              baseline_path=None, update_baseline=False, tolerance=REGRESSION_TOLERANCE, make_plots=False,
+              output_dir=RESULTS_DIR) -> int:
+    points = plan(variants, modes, sizes, workers, strong_size, weak_size, chunk_sizes)
+    print(f"⏳ Точек: {len(points)}, замеров в каждой: {repeats} (+{warmup} прогревочных)")
+
+    runs = []
+    for mode, variant, size, w, chunk_size in points:
+        run = {"mode": mode, "variant": variant, "name": VARIANTS[variant][0], "size": size,
+               "workers": w, "chunk_size": chunk_size}
+        run.update(run_one(variant, size, w, chunk_size, repeats, warmup))
+        runs.append(run)
+        print(f"[{mode}] {run['name']:<24} n={size:<8} {describe(run):<14} "
+              f"{run['median']:.3f} сек (IQR {run['iqr']:.3f}), {run['items_per_sec']:,} чисел/сек, "
+              f"CPU x{run['cpu_utilisation']}, RSS {run['peak_rss_mb']}/{run['children_peak_rss_mb']} МБ")
+        # Все варианты должны давать тот же результат, что и эталон
+        if not run["ok"]:
+            print(f"❌ {run['name']}: результаты расходятся с эталоном")
+    add_scaling(runs)
+
+    regressions = []
+    baseline_missing = False
+    if baseline_path:
+        if os.path.exists(baseline_path) and not update_baseline:
+            with open(baseline_path, encoding='utf-8') as f:
+                regressions = compare_with_baseline(runs, json.load(f), tolerance)
+        else:
+            baseline_missing = True
+
+    report = {
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": multiprocessing.cpu_count(),
+        },
+        "config": {
+            "repeats": repeats,
+            "warmup": warmup,
+            "sizes": sizes,
+            "workers": workers,
+            "strong_size": strong_size,
+            "weak_size": weak_size,
+            "chunk_sizes": chunk_sizes,
+            "tolerance": tolerance,
+        },
+        "runs": runs,
+        "regressions": len(regressions),
     }
 
-    # Запуск тестов
-    timings = {}
-    results = {}
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, 'benchmark.json'), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    write_csv(os.path.join(output_dir, 'benchmark_runs.csv'), runs)
+    if baseline_missing:
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n📌 Базовый прогон сохранён в {baseline_path}")
 
-    print("\n⏳ Запуск тестов производительности...")
-    for name, func in variants.items():
-        start_time = time.perf_counter()
-        res = func(data)
-        elapsed = time.perf_counter() - start_time
-        timings[name] = elapsed
-        results[name] = res
-        print(f"{name}: {elapsed:.2f} сек")
-
-    # Сохранение результатов
-    if not os.path.exists('results'):
-        os.makedirs('results')
-
-    save_results_to_json('results/benchmark_results.json', data, results["4. ProcessPool"])
-
-    # Сохранение таблицы результатов в CSV
-    with open('results/benchmark_timings.csv', 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(['Метод', 'Время (сек)', 'Ускорение'])
-        base_time = timings["1. Однопоточный"]
-        for name, time_ in timings.items():
-            writer.writerow([name, f"{time_:.2f}", f"{base_time / time_:.1f}x"])
-
-    # Построение графика
-    plt.figure(figsize=(12, 6))
-    names = list(timings.keys())
-    times = list(timings.values())
-
-    bars = plt.barh(names, times, color=[
-        '#FF6B6B', '#4ECDC4', '#45B7D1', '#88D8B0'
-    ])
-    plt.title('Сравнение методов параллельной обработки')
-    plt.xlabel('Время выполнения (секунды)')
-    plt.grid(axis='x', linestyle='--', alpha=0.7)
-
-    # Добавление значений на график
-    for bar in bars:
-        width = bar.get_width()
-        plt.text(width + 0.1, bar.get_y() + bar.get_height() / 2,
-                 f'{width:.2f} сек',
-                 va='center')
-
-    plt.tight_layout()
-    plt.savefig('results/benchmark_chart-1.png', dpi=120)
-    plt.show()
-    plt.close()
-
-    print("\n✅ Результаты сохранены в папке 'results':")
+    # Полные результаты - в двоичный файл, по пачкам по мере готовности процессов;
+    # образец первых 1000 чисел в JSON, как и раньше
+    data = generate_data(max(sizes))
+    binary_path = os.path.join(output_dir, 'benchmark_results.bin')
+    with BinaryResultsWriter(binary_path, len(data)) as writer:
+        process_with_queue(data, writer=writer)
+    saved = load_results_binary(binary_path)
+    save_results_to_json(os.path.join(output_dir, 'benchmark_results.json'), data, saved.flags(0, 1000).tolist())
+
+    charts = plot(runs, output_dir) if make_plots else []
+
+    print(f"\n✅ Результаты сохранены в папке '{output_dir}':")
+    print("- benchmark.json (все замеры)")
+    print("- benchmark_runs.csv (таблица замеров)")
+    print("- benchmark_results.bin (все числа и результаты, см. load_results_binary)")
     print("- benchmark_results.json (образец данных)")
-    print("- benchmark_timings.csv (таблица результатов)")
-    print("- benchmark_chart.png (визуализация)")
+    for path in charts:
+        print(f"- {os.path.basename(path)} (график)")
+
+    for run in regressions:
+        point = f"n={run['size']} {describe(run)}".strip()
+        print(f"⚠️ Регрессия: [{run['mode']}] {run['name']} {point}: "
+              f"{run['median']:.3f} сек против {run['baseline_median']:.3f}")
+    failed = any(not run["ok"] for run in runs)
+    return 1 if regressions or failed else 0
+
 
 if __name__ == '__main__':
-    benchmark()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Бенчмарк вариантов параллельной обработки")
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument("--modes", nargs="+", choices=["sizes", "strong", "weak", "chunks"],
+                        default=["sizes", "strong", "weak", "chunks"])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, DATA_SIZE])
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers(),
+                        help="число процессов/потоков для strong и weak (нужен 1 для ускорения)")
+    parser.add_argument("--strong-size", type=int, default=DATA_SIZE)
+    parser.add_argument("--weak-size", type=int, default=WEAK_SIZE_PER_WORKER)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=QUEUE_CHUNK_SIZES)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--baseline", help="JSON базового прогона; если файла нет - будет создан")
+    parser.add_argument("--update-baseline", action="store_true", help="перезаписать базовый прогон текущим")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    parser.add_argument("--plot", action="store_true", help="построить графики (нужен matplotlib)")
+    parser.add_argument("--output-dir", default=RESULTS_DIR)
+    # Внутренний режим: одна точка в этом процессе
+    parser.add_argument("--run-one", choices=list(VARIANTS), help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--run-workers", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--chunk-size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(json.dumps(measure(args.run_one, args.size, args.run_workers, args.chunk_size,
+                                 args.repeats, args.warmup)))
+        sys.exit()
+
+    sys.exit(benchmark(args.variants, args.modes, args.sizes, args.workers, args.repeats, args.warmup,
+                       args.strong_size, args.weak_size, args.chunk_sizes, args.baseline, args.update_baseline,
+                       args.tolerance, args.plot, args.output_dir))
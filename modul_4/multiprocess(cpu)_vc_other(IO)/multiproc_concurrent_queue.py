@@ -1,8 +1,13 @@
 import multiprocessing
 import concurrent.futures
+from array import array
+from multiprocessing import shared_memory
 from typing import List
 
-from modul_4.function import process_number
+import numpy as np
+
+from engine import engine
+from modul_4.function import BinaryResultsWriter, is_prime_array, process_number
 
 
 # Вариант: Однопоточная обработка
@@ -10,55 +15,149 @@ def process_single_thread(data: List[int]) -> List[bool]:
     return [process_number(num) for num in data]
 
 
+# Вариант: Векторная обработка - таблица решета Эратосфена и одна выборка NumPy по всему массиву
+# (числа повторяются, поэтому проверять каждое делением не нужно)
+def process_vectorized(data: List[int]) -> List[bool]:
+    return is_prime_array(data).tolist()
+
+
 # Вариант A: Ипользование пула потоков с concurrent.futures.
-def process_with_threads(data: List[int]) -> List[bool]:
-    with concurrent.futures.ThreadPoolExecutor() as executor:
+def process_with_threads(data: List[int], workers: int = None) -> List[bool]:
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
         return list(executor.map(process_number, data))
 
 
 # Вариант Б: Использование multiprocessing.Pool с пулом процессов, равным количеству CPU.
-def process_with_pool(data: List[int]) -> List[bool]:
-    with multiprocessing.Pool() as pool:
+def process_with_pool(data: List[int], workers: int = None) -> List[bool]:
+    with multiprocessing.Pool(workers) as pool:
         return pool.map(process_number, data, chunksize=1000)
 
 
 # Вариант В: Создание отдельных процессов с использованием multiprocessing.Process и
 # очередей (multiprocessing.Queue) для передачи данных.
+# Числа передаются пачками: (start, array('i')) - непрерывный участок данных, а обратно
+# приходит (start, bytes) - по байту 0/1 на число, который сразу ложится в общий буфер результатов.
+QUEUE_CHUNK_SIZE = 10000
+
+
 def worker(input_queue: multiprocessing.Queue, output_queue: multiprocessing.Queue):
     try:
         while True:
             item = input_queue.get()
             if item is None:
                 break
-            idx, num = item
-            output_queue.put((idx, process_number(num)))
+            start, numbers = item
+            output_queue.put((start, bytes(process_number(num) for num in numbers)))
     except KeyboardInterrupt:
         pass
 
 
-def process_with_queue(data: List[int]) -> List[bool]:
+def _chunk_typecode(data: List[int]):
+    """
+    Typecode array для пачек: 'i' или 'q' - наименьший, в который помещаются все числа,
+    None - среди данных есть не int или числа больше int64 (тогда пачки передаются списками)
+    """
+    if not all(type(num) is int for num in data):
+        return None
+    low, high = min(data, default=0), max(data, default=0)
+    for typecode in 'iq':
+        limit = 1 << (array(typecode).itemsize * 8 - 1)
+        if -limit <= low and high < limit:
+            return typecode
+    return None
+
+
+def process_with_queue(data: List[int], chunk_size: int = QUEUE_CHUNK_SIZE, workers: int = None,
+                       writer: BinaryResultsWriter = None) -> List[bool]:
+    # writer - сохранять каждую пачку в двоичный файл сразу, как только её вернул процесс
+    workers = workers or multiprocessing.cpu_count()
+    # Формат пачек выбирается до запуска процессов: array('i') не примет число вне int32
+    typecode = _chunk_typecode(data)
+    pack = list if typecode is None else lambda numbers: array(typecode, numbers)
     input_queue = multiprocessing.Queue()
     output_queue = multiprocessing.Queue()
     processes = []
 
-    for _ in range(multiprocessing.cpu_count()):
-        p = multiprocessing.Process(target=worker, args=(input_queue, output_queue))
-        p.start()
-        processes.append(p)
-
-    for idx, num in enumerate(data):
-        input_queue.put((idx, num))
-
-    for _ in range(multiprocessing.cpu_count()):
-        input_queue.put(None)
-
-    results = [None] * len(data)
-    for _ in range(len(data)):
-        idx, res = output_queue.get()
-        results[idx] = res
-
-
-    for p in processes:
-        p.join()
-
-    return results
\ No newline at end of file
+    try:
+        for _ in range(workers):
+            p = multiprocessing.Process(target=worker, args=(input_queue, output_queue))
+            p.start()
+            processes.append(p)
+
+        chunks = 0
+        for start in range(0, len(data), chunk_size):
+            input_queue.put((start, pack(data[start:start + chunk_size])))
+            chunks += 1
+
+        for _ in range(workers):
+            input_queue.put(None)
+
+        results = bytearray(len(data))
+        for _ in range(chunks):
+            start, block = output_queue.get()
+            results[start:start + len(block)] = block
+            if writer is not None:
+                writer.write(start, data[start:start + len(block)], np.frombuffer(block, dtype=np.uint8))
+    except BaseException:
+        # Процессы не получат конец данных и ждали бы его вечно (и интерпретатор - их на выходе)
+        for p in processes:
+            p.terminate()
+        raise
+    finally:
+        for p in processes:
+            p.join()
+
+    return [flag == 1 for flag in results]
+
+
+# Вариант Г: Общая память (multiprocessing.shared_memory) без сериализации данных.
+# Вход - массив int32, выход - массив байтов (0/1) в общей памяти; процессы получают
+# только (offset, length) своего участка и пишут результат на место.
+_shared = {}
+
+
+def _attach_shared(input_name: str, output_name: str, size: int):
+    # Выполняется один раз в каждом процессе пула
+    input_shm = shared_memory.SharedMemory(name=input_name)
+    output_shm = shared_memory.SharedMemory(name=output_name)
+    _shared['shm'] = (input_shm, output_shm)
+    _shared['numbers'] = np.ndarray((size,), dtype=np.int32, buffer=input_shm.buf)
+    _shared['flags'] = np.ndarray((size,), dtype=np.uint8, buffer=output_shm.buf)
+
+
+def _process_shared_slice(offset: int, length: int):
+    numbers = _shared['numbers'][offset:offset + length].tolist()
+    _shared['flags'][offset:offset + length] = [process_number(num) for num in numbers]
+
+
+def process_with_shared_memory(data: List[int], slices_per_worker: int = 4, workers: int = None) -> List[bool]:
+    size = len(data)
+    workers = workers or multiprocessing.cpu_count()
+    input_shm = shared_memory.SharedMemory(create=True, size=max(size * 4, 1))
+    output_shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        numbers = np.ndarray((size,), dtype=np.int32, buffer=input_shm.buf)
+        numbers[:] = data
+        flags = np.ndarray((size,), dtype=np.uint8, buffer=output_shm.buf)
+
+        step = max(1, -(-size // (workers * slices_per_worker)))
+        slices = [(offset, min(step, size - offset)) for offset in range(0, size, step)]
+        with multiprocessing.Pool(workers, initializer=_attach_shared,
+                                  initargs=(input_shm.name, output_shm.name, size)) as pool:
+            pool.starmap(_process_shared_slice, slices)
+
+        results = flags.view(np.bool_).tolist()
+        # Представления должны быть освобождены до закрытия общей памяти
+        del numbers, flags
+        return results
+    finally:
+        input_shm.close()
+        input_shm.unlink()
+        output_shm.close()
+        output_shm.unlink()
+
+
+# Вариант Д: Движок engine.py - сам выбирает способ выполнения, число процессов и chunksize
+# по замеру на выборке; пулы процессов остаются между вызовами
+def process_with_engine(data: List[int]) -> List[bool]:
+    return engine.map(process_number, data)
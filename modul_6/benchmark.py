@@ -0,0 +1,235 @@
+"""
+Нагрузочный тест currency_server без доступа в интернет.
+
+Запускает локальную заглушку вместо api.exchangerate-api.com (с задержкой и долей ошибок),
+поднимает currency_server в отдельном процессе с --upstream на заглушку и
+нагружает его конкурентными keep-alive клиентами на нескольких уровнях параллелизма.
+Результат - JSON (rps, p50/p95/p99, ошибки, число обращений к внешнему API),
+чтобы можно было сравнивать версии:
+
+    python benchmark.py --concurrency 1 10 100 --duration 5 --output results.json
+"""
+import argparse
+import asyncio
+import http.server
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+
+CURRENCY_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "currency_server.py")
+
+# Таблица заглушки в формате ответа провайдера
+FAKE_RATES = {
+    "USD": 1, "EUR": 0.899, "GBP": 0.759, "JPY": 141.61, "CHF": 0.846, "CNY": 7.1,
+    "RUB": 90.71, "KZT": 479.94, "TRY": 34.08, "INR": 83.83, "CAD": 1.36, "AUD": 1.48,
+}
+BENCH_PATHS = ["/USD", "/EUR", "/GBP", "/JPY", "/RUB", "/CNY"]
+
+
+class FakeUpstream(http.server.ThreadingHTTPServer):
+    """Локальная заглушка внешнего API с настраиваемой задержкой и долей ответов 500"""
+
+    daemon_threads = True
+
+    def __init__(self, port: int, latency: float, error_rate: float):
+        super().__init__(("127.0.0.1", port), FakeUpstreamHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def count(self, error: bool):
+        with self._lock:
+            self.calls += 1
+            self.errors += error
+
+
+class FakeUpstreamHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        error = random.random() < server.error_rate
+        server.count(error)
+        time.sleep(server.latency)
+
+        currency = self.path.rsplit("/", 1)[-1].upper()
+        if error:
+            status, data = 500, {"error": "fake upstream error"}
+        elif currency not in FAKE_RATES:
+            status, data = 404, {"error": "unknown currency"}
+        else:
+            base = FAKE_RATES[currency]
+            status, data = 200, {
+                "base": currency,
+                "date": time.strftime("%Y-%m-%d"),
+                "time_last_updated": 1726617601,
+                "rates": {code: rate / base for code, rate in FAKE_RATES.items()},
+            }
+
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"currency_server не поднялся на порту {port}")
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def virtual_user(port: int, deadline: float, latencies: list, statuses: dict):
+    """Один клиент: keep-alive соединение, запросы подряд до deadline"""
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        if writer is None:
+            try:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            except OSError:
+                statuses["connect_error"] = statuses.get("connect_error", 0) + 1
+                await asyncio.sleep(0.01)
+                continue
+
+        path = random.choice(BENCH_PATHS)
+        start = time.perf_counter()
+        try:
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n".encode())
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+        except (OSError, IndexError, ValueError, asyncio.IncompleteReadError):
+            statuses["connection_error"] = statuses.get("connection_error", 0) + 1
+            writer.close()
+            writer = None
+            continue
+
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+
+    if writer is not None:
+        writer.close()
+
+
+async def run_level(port: int, concurrency: int, duration: float) -> dict:
+    latencies = []
+    statuses = {}
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(virtual_user(port, deadline, latencies, statuses) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    total = sum(statuses.values())
+    errors = total - statuses.get(200, 0)
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "statuses": {str(key): value for key, value in statuses.items()},
+    }
+
+
+def benchmark(concurrency_levels, duration: float, latency: float, error_rate: float, cache_ttl: float) -> dict:
+    upstream = FakeUpstream(free_port(), latency, error_rate)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    upstream_url = f"http://127.0.0.1:{upstream.server_address[1]}"
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, CURRENCY_SERVER, "--host", "127.0.0.1", "--port", str(port),
+         "--upstream", upstream_url, "--cache-ttl", str(cache_ttl), "--snapshot", ""],
+        cwd=os.path.dirname(CURRENCY_SERVER),
+        stdout=subprocess.DEVNULL,
+    )
+    levels = []
+    try:
+        wait_for_port(port)
+        for concurrency in concurrency_levels:
+            calls_before = upstream.calls
+            level = asyncio.run(run_level(port, concurrency, duration))
+            level["upstream_calls"] = upstream.calls - calls_before
+            levels.append(level)
+            print(
+                f"{concurrency:>5} клиентов: {level['rps']:>9} rps, p50 {level['p50_ms']} мс, "
+                f"p99 {level['p99_ms']} мс, ошибок {level['error_rate']:.2%}, "
+                f"обращений к API {level['upstream_calls']}",
+                file=sys.stderr,
+            )
+    finally:
+        server.terminate()
+        server.wait()
+        upstream.shutdown()
+        upstream.server_close()
+
+    return {
+        "config": {
+            "duration": duration,
+            "upstream_latency": latency,
+            "upstream_error_rate": error_rate,
+            "cache_ttl": cache_ttl,
+            "paths": BENCH_PATHS,
+        },
+        "upstream": {"calls": upstream.calls, "errors": upstream.errors},
+        "levels": levels,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочный тест currency_server с локальной заглушкой API")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--duration", type=float, default=5, help="длительность каждого уровня, сек")
+    parser.add_argument("--latency", type=float, default=0.1, help="задержка заглушки API, сек")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 500 от заглушки API")
+    parser.add_argument("--cache-ttl", type=float, default=3600, help="--cache-ttl для currency_server")
+    parser.add_argument("--output", help="файл для JSON с результатами (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    results = benchmark(args.concurrency, args.duration, args.latency, args.error_rate, args.cache_ttl)
+    report = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+    else:
+        print(report)
@@ -0,0 +1,85 @@
+import gzip
+import json
+from typing import NamedTuple
+
+import numpy as np
+
+
+class PreparedResponse(NamedTuple):
+    """Готовое к отправке тело ответа для одной базовой валюты"""
+    body: bytes
+    gzip_body: bytes
+    etag: str
+    gzip_etag: str
+
+
+class CrossRates:
+    """
+    Кросс-курсы для любой базовой валюты из одной таблицы курсов USD.
+
+    rate(B -> X) = rate(USD -> X) / rate(USD -> B), поэтому достаточно
+    одного запроса к внешнему API на все ~160 валют.
+    Курсы хранятся плотным массивом float64, код валюты -> индекс в словаре.
+    """
+
+    def __init__(self, codes: list, rates: np.ndarray, meta: dict):
+        self.codes = codes
+        self.index = {code: i for i, code in enumerate(codes)}
+        self.rates = rates
+        # Остальные поля ответа (date, time_last_updated, provider, ...), порядок ключей сохраняется
+        self.meta = meta
+        # base -> PreparedResponse; таблица не меняется до следующего обновления,
+        # поэтому JSON и gzip для каждой базы считаются один раз
+        self._prepared = {}
+
+    @classmethod
+    def from_table(cls, usd_table: dict) -> "CrossRates":
+        """Из ответа внешнего API вида {"base": "USD", ..., "rates": {"USD": 1, ...}}"""
+        rates = usd_table["rates"]
+        return cls(
+            list(rates),
+            np.fromiter(rates.values(), dtype=np.float64, count=len(rates)),
+            dict(usd_table, rates=None),
+        )
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.index
+
+    def vector(self, base: str) -> np.ndarray:
+        """Курсы всех валют относительно base одним векторным делением"""
+        return self.rates / self.rates[self.index[base]]
+
+    def table(self, base: str) -> dict:
+        """Таблица в формате ответа внешнего API для базовой валюты base"""
+        data = dict(self.meta)
+        data["base"] = base
+        data["rates"] = dict(zip(self.codes, self.vector(base).tolist()))
+        return data
+
+    def convert(self, amounts, sources, targets) -> np.ndarray:
+        """
+        Пересчёт amounts[i] из sources[i] в targets[i] одним векторным проходом.
+        Неизвестный код валюты - KeyError с этим кодом; переполнение даёт inf (без предупреждения numpy).
+        """
+        index = self.index
+        source_idx = np.fromiter((index[code] for code in sources), dtype=np.intp, count=len(sources))
+        target_idx = np.fromiter((index[code] for code in targets), dtype=np.intp, count=len(targets))
+        amounts = np.asarray(amounts, dtype=np.float64)
+        with np.errstate(over='ignore'):
+            return amounts * self.rates[target_idx] / self.rates[source_idx]
+
+    def prepared(self, base: str) -> PreparedResponse:
+        """Сериализованный ответ для base: JSON, его gzip-версия и ETag"""
+        response = self._prepared.get(base)
+        if response is None:
+            body = json.dumps(self.table(base)).encode()
+            # Сильный ETag: тело однозначно определяется базой и временем обновления курсов
+            etag = f'"{base}-{self.meta.get("time_last_updated")}"'
+            response = PreparedResponse(
+                body=body,
+                gzip_body=gzip.compress(body, mtime=0),
+                etag=etag,
+                gzip_etag=etag[:-1] + '-gzip"',
+            )
+            self._prepared[base] = response
+        return response
@@ -1,54 +1,467 @@
-import http.server
-import socketserver
-import urllib.request
+import argparse
+import asyncio
+import concurrent.futures
+import http.client
 import json
+import logging
+import math
+import time
+import urllib.parse
+from http import HTTPStatus
 
+from cross_rates import CrossRates
+from metrics import Metrics
+from rate_cache import RateCache
+from rate_snapshot import load_snapshot, save_snapshot
 
+logger = logging.getLogger(__name__)
+
+
+HOST = ''
 PORT = 8000
 # запустив программу в файле, можем перейти по http://127.0.0.1:8000/USD
 # 3 символа после слеша означают сокращение валюты
+# Пакетные запросы:
+#   GET  /rates?bases=USD,EUR,GBP  -> {"USD": {...}, "EUR": {...}, "GBP": {...}}
+#   POST /convert [{"amount": 10, "from": "USD", "to": "EUR"}, ...] -> {"results": [...]}
+# Метрики в формате Prometheus: GET /metrics
 
 # Можно запустить tkinter_currency увидим минимальный интерфейс для взаимодействия
 
-class CurrencyHandler(http.server.BaseHTTPRequestHandler):
-    def do_GET(self):
+# Адрес внешнего API можно переопределить (--upstream), например для локальной заглушки в benchmark.py
+UPSTREAM_URL = "https://api.exchangerate-api.com"
+UPSTREAM_PATH = "/v4/latest/{currency}"
+PROVIDER = "https://www.exchangerate-api.com"
+# Из внешнего API берём только эту таблицу, остальные базы считаются локально
+BASE_CURRENCY = "USD"
+
+# Сколько одновременных keep-alive соединений держим к внешнему API
+UPSTREAM_POOL_SIZE = 10
+UPSTREAM_TIMEOUT = 10
+# Сколько секунд ждём следующий запрос от клиента в keep-alive соединении
+KEEP_ALIVE_TIMEOUT = 15
+
+# Курсы у провайдера обновляются примерно раз в сутки (поле time_last_updated)
+CACHE_TTL = 3600
+# Сколько ещё после CACHE_TTL можно отдавать устаревший курс, пока идёт обновление
+CACHE_STALE_TTL = 86400
+# После неудачного обновления курсов следующее фоновое - не раньше чем через столько секунд
+CACHE_REFRESH_COOLDOWN = 30
+CACHE_MAXSIZE = 256
+
+# Последние курсы сохраняются на диск, чтобы после перезапуска сразу отвечать по ним
+SNAPSHOT_PATH = "rates.snapshot"
+
+# Ограничения для пакетных запросов /rates и /convert
+MAX_BODY_SIZE = 16 * 1024 * 1024
+MAX_CONVERT_ITEMS = 100_000
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class UpstreamPool:
+    """
+    Пул keep-alive соединений к внешнему API.
+
+    http.client работает блокирующе, поэтому сам запрос выполняется в пуле потоков,
+    а событийный цикл в это время продолжает обслуживать других клиентов.
+    Соединения берутся и возвращаются только из потока цикла, поэтому блокировки не нужны.
+    У пула свой ThreadPoolExecutor, чтобы медленный API не занимал общий executor цикла.
+    """
+
+    def __init__(self, base_url: str, size: int = UPSTREAM_POOL_SIZE, timeout: float = UPSTREAM_TIMEOUT):
+        url = urllib.parse.urlsplit(base_url)
+        self.connection_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        self.host = url.netloc
+        # Путь из base_url добавляется перед путём каждого запроса
+        self.prefix = url.path.rstrip("/")
+        self.timeout = timeout
+        self._idle = []
+        self._semaphore = asyncio.Semaphore(size)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=size, thread_name_prefix="upstream")
+
+    def _connect(self) -> http.client.HTTPConnection:
+        return self.connection_class(self.host, timeout=self.timeout)
+
+    @staticmethod
+    def _request(conn: http.client.HTTPConnection, path: str):
+        conn.request("GET", path, headers={"Connection": "keep-alive"})
+        response = conn.getresponse()
+        return response.status, response.reason, response.read()
+
+    async def get(self, path: str):
+        """Возвращает (status, reason, body) ответа внешнего API"""
+        loop = asyncio.get_running_loop()
+        path = self.prefix + path
+        async with self._semaphore:
+            reused = bool(self._idle)
+            conn = self._idle.pop() if reused else self._connect()
+            try:
+                result = await loop.run_in_executor(self._executor, self._request, conn, path)
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if not reused:
+                    raise
+                # Сервер закрыл простаивавшее соединение - повторяем один раз на новом
+                conn = self._connect()
+                try:
+                    result = await loop.run_in_executor(self._executor, self._request, conn, path)
+                except Exception:
+                    conn.close()
+                    raise
+            except Exception:
+                conn.close()
+                raise
+            self._idle.append(conn)
+            return result
+
+    def close(self):
+        while self._idle:
+            self._idle.pop().close()
+        self._executor.shutdown(wait=False)
+
+
+class UpstreamError(Exception):
+    """Внешний API ответил не 200"""
+
+    def __init__(self, status: int, reason: str):
+        super().__init__(f"{status} {reason}")
+        self.status = status
+        self.reason = reason
+
+
+def error_response(status: int, message: str):
+    return status, json.dumps({"error": message}).encode(), {}
+
+
+def accepts_gzip(headers: dict) -> bool:
+    """Проверяет Accept-Encoding клиента (gzip;q=0 означает отказ)"""
+    for coding in headers.get('accept-encoding', '').split(','):
+        name, _, params = coding.partition(';')
+        if name.strip().lower() in ('gzip', '*'):
+            quality = params.replace(' ', '').removeprefix('q=')
+            try:
+                return not quality or float(quality) > 0
+            except ValueError:
+                return True
+    return False
+
+
+def etag_matches(headers: dict, *etags: str) -> bool:
+    """Совпадает ли If-None-Match клиента с одним из наших ETag"""
+    if_none_match = headers.get('if-none-match')
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    client_tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    return any(etag in client_tags for etag in etags)
+
+
+class CurrencyHandler:
+    """Обработка запросов вида /USD: проксирует курс валюты из внешнего API"""
+
+    def __init__(self, upstream: UpstreamPool, cache: RateCache, snapshot_path: str = None):
+        self.upstream = upstream
+        self.cache = cache
+        self.snapshot_path = snapshot_path
+        self.metrics = Metrics()
+
+    async def fetch_rates(self, currency: str) -> CrossRates:
+        """Загружает таблицу курсов из внешнего API (без кеша)"""
+        metrics = self.metrics
+        metrics.upstream_requests += 1
+        start = time.perf_counter()
+        try:
+            status, reason, data = await self.upstream.get(UPSTREAM_PATH.format(currency=currency))
+        except Exception:
+            metrics.upstream_errors += 1
+            raise
+        finally:
+            metrics.upstream_latency.observe(time.perf_counter() - start)
+        if status != 200:
+            metrics.upstream_errors += 1
+            raise UpstreamError(status, reason)
+
+        json_data = json.loads(data.decode('utf-8'))
+        # Добавляем информацию о провайдере
+        json_data["provider"] = PROVIDER
+        rates = CrossRates.from_table(json_data)
+
+        if self.snapshot_path:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, save_snapshot, self.snapshot_path, rates)
+            except Exception as e:
+                logger.warning(f"Не удалось сохранить снимок курсов {self.snapshot_path}: {e}")
+        return rates
+
+    def restore_snapshot(self) -> bool:
+        """
+        Кладёт в кеш курсы из снимка на диске как устаревшие и запускает фоновое обновление.
+        До его завершения запросы обслуживаются по последним известным курсам.
+        """
+        rates = load_snapshot(self.snapshot_path) if self.snapshot_path else None
+        if rates is None:
+            return False
+        self.cache.put(BASE_CURRENCY, rates, fetched_at=time.monotonic() - self.cache.ttl)
+        self.cache.refresh(BASE_CURRENCY, self.fetch_rates)
+        return True
+
+    async def load_rates(self) -> CrossRates:
+        """Таблица USD из кеша, при промахе - из внешнего API. Общая для всех маршрутов"""
+        return await self.cache.get(BASE_CURRENCY, self.fetch_rates)
+
+    async def handle(self, method: str, path: str, headers: dict, body: bytes = b""):
+        """Возвращает (status, body, headers) ответа клиенту, body - готовые байты"""
+        metrics = self.metrics
+        metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            response = await self.route(method, path, headers, body)
+        finally:
+            metrics.in_flight -= 1
+        metrics.request_latency.observe(time.perf_counter() - start)
+        metrics.requests[int(response[0])] += 1
+        return response
+
+    async def route(self, method: str, path: str, headers: dict, body: bytes):
+        url = urllib.parse.urlsplit(path)
+        if url.path == "/metrics":
+            route, allowed = self.handle_metrics, "GET"
+        elif url.path == "/rates":
+            route, allowed = self.handle_rates, "GET"
+        elif url.path == "/convert":
+            route, allowed = self.handle_convert, "POST"
+        else:
+            route, allowed = self.handle_currency, "GET"
+
+        if method != allowed:
+            return error_response(HTTPStatus.METHOD_NOT_ALLOWED, "Method not allowed")
+
+        try:
+            return await route(url, headers, body)
+        except UpstreamError as e:
+            return error_response(e.status, f"Currency not found or API error: {e.reason}")
+        except Exception as e:
+            return error_response(HTTPStatus.INTERNAL_SERVER_ERROR, str(e))
+
+    async def handle_metrics(self, url: urllib.parse.SplitResult, headers: dict, body: bytes):
+        """GET /metrics - счётчики в текстовом формате Prometheus"""
+        return HTTPStatus.OK, self.metrics.render(self.cache), {"Content-Type": METRICS_CONTENT_TYPE}
+
+    async def handle_currency(self, url: urllib.parse.SplitResult, headers: dict, body: bytes):
+        """GET /USD - таблица курсов для одной базовой валюты"""
         # Извлекаем код валюты из URL (например, /USD -> USD)
-        currency = self.path.strip('/').upper()
+        currency = url.path.strip('/').upper()
 
         if not currency or len(currency) != 3:
-            self.send_response(400)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({"error": "Invalid currency code"}).encode())
-            return
+            return error_response(HTTPStatus.BAD_REQUEST, "Invalid currency code")
+
+        rates = await self.load_rates()
+        if currency not in rates:
+            return error_response(HTTPStatus.NOT_FOUND, "Currency not found or API error: Not Found")
+
+        # Тело уже сериализовано и сжато при первом запросе этой базы
+        prepared = rates.prepared(currency)
+        use_gzip = accepts_gzip(headers)
+        etag = prepared.gzip_etag if use_gzip else prepared.etag
+        response_headers = {"ETag": etag, "Vary": "Accept-Encoding"}
 
+        if etag_matches(headers, prepared.etag, prepared.gzip_etag):
+            return HTTPStatus.NOT_MODIFIED, b"", response_headers
+        if use_gzip:
+            response_headers["Content-Encoding"] = "gzip"
+            return HTTPStatus.OK, prepared.gzip_body, response_headers
+        return HTTPStatus.OK, prepared.body, response_headers
+
+    async def handle_rates(self, url: urllib.parse.SplitResult, headers: dict, body: bytes):
+        """GET /rates?bases=USD,EUR,GBP - несколько таблиц одним ответом {"USD": {...}, "EUR": {...}}"""
+        query = urllib.parse.parse_qs(url.query)
+        bases = [code.strip().upper() for value in query.get("bases", []) for code in value.split(",")]
+        bases = list(dict.fromkeys(code for code in bases if code))
+        if not bases:
+            return error_response(HTTPStatus.BAD_REQUEST, "Parameter 'bases' is required")
+
+        rates = await self.load_rates()
+        unknown = [code for code in bases if code not in rates]
+        if unknown:
+            return error_response(HTTPStatus.NOT_FOUND, f"Currency not found: {', '.join(unknown)}")
+
+        # Склеиваем уже сериализованные таблицы, без повторного json.dumps
+        parts = [b'"%s": %s' % (code.encode(), rates.prepared(code).body) for code in bases]
+        return HTTPStatus.OK, b"{" + b", ".join(parts) + b"}", {}
+
+    async def handle_convert(self, url: urllib.parse.SplitResult, headers: dict, body: bytes):
+        """
+        POST /convert с телом [{"amount": 10, "from": "USD", "to": "EUR"}, ...].
+        Все пересчёты выполняются одним векторным проходом, результаты - в порядке запроса.
+        """
         try:
-            # Запрашиваем данные из внешнего API
-            with urllib.request.urlopen(f"https://api.exchangerate-api.com/v4/latest/{currency}") as response:
-                data = response.read().decode('utf-8')
-                json_data = json.loads(data)
-
-                # Добавляем информацию о провайдере
-                json_data["provider"] = "https://www.exchangerate-api.com"
-
-                # Отправляем ответ
-                self.send_response(200)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(json_data).encode())
-
-        except urllib.error.HTTPError as e:
-            self.send_response(e.code)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({"error": f"Currency not found or API error: {e.reason}"}).encode())
-        except Exception as e:
-            self.send_response(500)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({"error": str(e)}).encode())
+            items = json.loads(body)
+            if not isinstance(items, list):
+                raise ValueError("body must be a JSON list")
+            if len(items) > MAX_CONVERT_ITEMS:
+                raise ValueError(f"too many items, maximum is {MAX_CONVERT_ITEMS}")
+            amounts = [parse_amount(item["amount"]) for item in items]
+            sources = [str(item["from"]).upper() for item in items]
+            targets = [str(item["to"]).upper() for item in items]
+        except (ValueError, TypeError, KeyError) as e:
+            return error_response(HTTPStatus.BAD_REQUEST, f"Invalid convert request: {e}")
+
+        rates = await self.load_rates()
+        try:
+            converted = rates.convert(amounts, sources, targets)
+        except KeyError as e:
+            return error_response(HTTPStatus.NOT_FOUND, f"Currency not found: {e.args[0]}")
+        results = converted.tolist()
+        if not all(map(math.isfinite, results)):
+            # Конечная сумма, умноженная на курс, вышла за пределы float
+            return error_response(HTTPStatus.BAD_REQUEST, "Invalid convert request: amount is out of range")
+
+        return HTTPStatus.OK, json.dumps({
+            "provider": PROVIDER,
+            "time_last_updated": rates.meta.get("time_last_updated"),
+            "results": results,
+        }).encode(), {}
+
+
+def parse_amount(value) -> float:
+    """Сумма для /convert: только конечное число JSON (без строк, true/false, NaN и Infinity)"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError(f"amount must be a number, got {json.dumps(value)}")
+    try:
+        amount = float(value)
+    except OverflowError:
+        raise ValueError(f"amount is out of range, got {value}")
+    if not math.isfinite(amount):
+        raise ValueError(f"amount must be finite, got {value}")
+    return amount
+
+
+def build_response(status: int, body: bytes, keep_alive: bool, headers: dict = None) -> bytes:
+    """Собирает HTTP/1.1 ответ с Content-Length, чтобы клиент мог переиспользовать соединение"""
+    try:
+        reason = HTTPStatus(status).phrase
+    except ValueError:
+        reason = ""
+    headers = dict(headers or {})
+    head = [
+        f"HTTP/1.1 {status} {reason}",
+        f"Content-Type: {headers.pop('Content-Type', 'application/json')}",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    head.extend(f"{name}: {value}" for name, value in headers.items())
+    return ("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body
+
+
+async def read_request(reader: asyncio.StreamReader):
+    """
+    Читает стартовую строку и заголовки запроса.
+    Возвращает (method, path, version, headers) или None, если клиент закрыл соединение.
+    """
+    request_line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_TIMEOUT)
+    if not request_line:
+        return None
+    method, path, version = request_line.decode('latin-1').split()
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return method, path, version, headers
+
+
+def wants_keep_alive(version: str, headers: dict) -> bool:
+    connection = headers.get('connection', '').lower()
+    if version == 'HTTP/1.1':
+        return connection != 'close'
+    return connection == 'keep-alive'
+
+
+def content_length(headers: dict) -> int:
+    """Длина тела из Content-Length; ValueError, если это не целое неотрицательное число"""
+    value = headers.get('content-length', '')
+    if not value:
+        return 0
+    # Длиннее 18 цифр - заведомо больше MAX_BODY_SIZE (и int() не разбирает слишком длинные строки)
+    if not (value.isascii() and value.isdigit()) or len(value) > 18:
+        raise ValueError(f"invalid Content-Length: {value[:20]!r}")
+    return int(value)
+
+
+async def serve_client(handler: CurrencyHandler, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Обслуживает одно клиентское соединение, пока клиент держит keep-alive"""
+    try:
+        while True:
+            try:
+                request = await read_request(reader)
+            except ValueError:
+                status, body, _ = error_response(HTTPStatus.BAD_REQUEST, "Bad request")
+                writer.write(build_response(status, body, False))
+                await writer.drain()
+                break
+            if request is None:
+                break
+            method, path, version, headers = request
+
+            keep_alive = wants_keep_alive(version, headers)
+            try:
+                length = content_length(headers)
+            except ValueError:
+                status, body, _ = error_response(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+                writer.write(build_response(status, body, False))
+                await writer.drain()
+                break
+            if length > MAX_BODY_SIZE:
+                status, body, _ = error_response(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+                writer.write(build_response(status, body, False))
+                await writer.drain()
+                break
+            request_body = await reader.readexactly(length) if length else b""
+
+            status, body, response_headers = await handler.handle(method, path, headers, request_body)
+            writer.write(build_response(status, body, keep_alive, response_headers))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def main(host: str = HOST, port: int = PORT, upstream_url: str = UPSTREAM_URL, cache_ttl: float = CACHE_TTL,
+               snapshot_path: str = SNAPSHOT_PATH):
+    upstream = UpstreamPool(upstream_url)
+    cache = RateCache(ttl=cache_ttl, maxsize=CACHE_MAXSIZE, stale_ttl=CACHE_STALE_TTL,
+                      refresh_cooldown=CACHE_REFRESH_COOLDOWN)
+    handler = CurrencyHandler(upstream, cache, snapshot_path)
+    if handler.restore_snapshot():
+        print(f"Курсы восстановлены из {snapshot_path}, обновление идёт в фоне")
+    server = await asyncio.start_server(
+        lambda reader, writer: serve_client(handler, reader, writer), host, port
+    )
+    print(f"Serving at port {port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        upstream.close()
 
 
-with socketserver.TCPServer(("", PORT), CurrencyHandler) as httpd:
-    print(f"Serving at port {PORT}")
-    httpd.serve_forever()
\ No newline at end of file
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Прокси курсов валют")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--upstream", default=UPSTREAM_URL, help="адрес внешнего API")
+    parser.add_argument("--cache-ttl", type=float, default=CACHE_TTL, help="время жизни курсов в кеше, сек")
+    parser.add_argument("--snapshot", default=SNAPSHOT_PATH, help="файл снимка курсов, пустая строка - не сохранять")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.host, args.port, args.upstream, args.cache_ttl, args.snapshot))
+    except KeyboardInterrupt:
+        pass
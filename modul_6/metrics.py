@@ -0,0 +1,81 @@
+"""
+Метрики currency_server в текстовом формате Prometheus (отдаются по /metrics).
+
+Все значения меняются только из потока событийного цикла, поэтому обычные
+int/float без блокировок: запись метрики - это пара сложений и bisect по границам корзин.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+
+
+# Границы корзин гистограмм задержек, секунды
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        # Последний элемент - корзина +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, help_text: str) -> list:
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum {self.sum}")
+        lines.append(f"{name}_count {self.count}")
+        return lines
+
+
+class Metrics:
+    def __init__(self):
+        self.requests = defaultdict(int)  # HTTP статус -> число ответов
+        self.in_flight = 0
+        self.request_latency = Histogram()
+        self.upstream_latency = Histogram()
+        self.upstream_requests = 0
+        self.upstream_errors = 0
+
+    def render(self, cache=None) -> bytes:
+        """Текст для /metrics; cache - RateCache, чьи счётчики попаданий тоже выводятся"""
+        lines = [
+            "# HELP currency_requests_total Ответы клиентам по HTTP статусу",
+            "# TYPE currency_requests_total counter",
+        ]
+        lines += [f'currency_requests_total{{status="{status}"}} {count}' for status, count in sorted(self.requests.items())]
+        lines += [
+            "# HELP currency_requests_in_flight Запросы в обработке",
+            "# TYPE currency_requests_in_flight gauge",
+            f"currency_requests_in_flight {self.in_flight}",
+        ]
+        lines += self.request_latency.render(
+            "currency_request_duration_seconds", "Полное время обработки запроса")
+        lines += self.upstream_latency.render(
+            "currency_upstream_duration_seconds", "Время запроса к внешнему API")
+        lines += [
+            "# HELP currency_upstream_requests_total Запросы к внешнему API",
+            "# TYPE currency_upstream_requests_total counter",
+            f"currency_upstream_requests_total {self.upstream_requests}",
+            "# HELP currency_upstream_errors_total Ошибки внешнего API (не 200 или исключение)",
+            "# TYPE currency_upstream_errors_total counter",
+            f"currency_upstream_errors_total {self.upstream_errors}",
+        ]
+        if cache is not None:
+            lines += [
+                "# HELP currency_cache_requests_total Обращения к кешу курсов по результату",
+                "# TYPE currency_cache_requests_total counter",
+                f'currency_cache_requests_total{{result="hit"}} {cache.hits}',
+                f'currency_cache_requests_total{{result="stale"}} {cache.stale_hits}',
+                f'currency_cache_requests_total{{result="miss"}} {cache.misses}',
+            ]
+        return ("\n".join(lines) + "\n").encode()
@@ -0,0 +1,91 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class RateCache:
+    """
+    Кеш курсов в памяти процесса, ключ - код базовой валюты.
+
+    - запись свежая ttl секунд, после этого ещё stale_ttl секунд отдаётся "как есть",
+      а в фоне запускается обновление; после неудачного обновления следующее фоновое
+      начинается не раньше чем через refresh_cooldown секунд (не нагружаем упавший источник);
+    - одновременные промахи по одному ключу объединяются: загрузка выполняется
+      один раз, остальные запросы ждут её результат (single-flight);
+    - размер ограничен maxsize, при переполнении вытесняется давно не использованная запись.
+    """
+
+    def __init__(self, ttl: float = 3600, maxsize: int = 256, stale_ttl: float = 86400,
+                 refresh_cooldown: float = 30):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.stale_ttl = stale_ttl
+        self.refresh_cooldown = refresh_cooldown
+        # key -> (value, fetched_at), порядок - от давно использованных к недавним
+        self._entries = OrderedDict()
+        # key -> asyncio.Task текущей загрузки
+        self._inflight = {}
+        # key -> время последней неудачной загрузки
+        self._failed_at = {}
+        # Счётчики для /metrics
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get(self, key, loader):
+        """
+        Возвращает значение по ключу, при необходимости вызывая await loader(key).
+        Исключение из loader получают все ожидающие, в кеш оно не попадает.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl + self.stale_ttl:
+                self._entries.move_to_end(key)
+                if age >= self.ttl:
+                    # Отдаём устаревшее значение, обновление идёт в фоне
+                    self.stale_hits += 1
+                    failed_at = self._failed_at.get(key)
+                    if failed_at is None or time.monotonic() - failed_at >= self.refresh_cooldown:
+                        self.refresh(key, loader)
+                else:
+                    self.hits += 1
+                return value
+
+        self.misses += 1
+        # shield: отмена одного клиента не должна отменять общую загрузку
+        return await asyncio.shield(self.refresh(key, loader))
+
+    def refresh(self, key, loader) -> asyncio.Task:
+        """Запускает загрузку ключа, если она ещё не идёт, и возвращает её задачу"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, loader))
+            # Ошибку фонового обновления никто может не ждать - забираем её, чтобы не было предупреждения
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return task
+
+    async def _load(self, key, loader):
+        try:
+            value = await loader(key)
+        except Exception:
+            self._failed_at[key] = time.monotonic()
+            raise
+        else:
+            self._failed_at.pop(key, None)
+            self.put(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def put(self, key, value, fetched_at: float = None):
+        self._entries[key] = (value, time.monotonic() if fetched_at is None else fetched_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            evicted, _ = self._entries.popitem(last=False)
+            self._failed_at.pop(evicted, None)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,80 @@
+"""
+Снимок таблицы курсов на диске для быстрого "тёплого" старта currency_server.
+
+Формат файла (little-endian):
+    заголовок   8s magic, uint32 число валют n, uint32 длина meta
+    коды        n * 3 байта ASCII, дополнены нулями до кратности 8
+    курсы       n * float64
+    meta        JSON с остальными полями ответа (date, time_last_updated, provider, ...)
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from cross_rates import CrossRates
+
+
+MAGIC = b"CRSNAP1\0"
+HEADER = struct.Struct("<8sII")
+CODE_SIZE = 3
+
+
+def _padded(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def save_snapshot(path: str, rates: CrossRates):
+    """
+    Атомарно записывает снимок: сначала во временный файл рядом, затем os.replace.
+    При падении процесса на диске остаётся либо старый, либо новый снимок целиком.
+    """
+    codes = b"".join(code.encode("ascii") for code in rates.codes)
+    if len(codes) != CODE_SIZE * len(rates.codes):
+        raise ValueError("Коды валют должны состоять из 3 символов ASCII")
+    meta = json.dumps(rates.meta).encode()
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(rates.codes), len(meta)))
+            f.write(codes.ljust(_padded(len(codes)), b"\0"))
+            f.write(rates.rates.astype("<f8").tobytes())
+            f.write(meta)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_snapshot(path: str):
+    """
+    Читает снимок через mmap. Возвращает CrossRates или None, если файла нет или он повреждён.
+    Курсы копируются из отображения, и оно сразу закрывается: открытое отображение
+    не дало бы заменить файл через os.replace в Windows.
+    """
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, count, meta_size = HEADER.unpack_from(mm, 0)
+            if magic != MAGIC:
+                return None
+            codes_offset = HEADER.size
+            rates_offset = codes_offset + _padded(count * CODE_SIZE)
+            meta_offset = rates_offset + count * 8
+            if meta_offset + meta_size != len(mm):
+                return None
+
+            raw_codes = mm[codes_offset:codes_offset + count * CODE_SIZE].decode("ascii")
+            codes = [raw_codes[i:i + CODE_SIZE] for i in range(0, len(raw_codes), CODE_SIZE)]
+            values = np.frombuffer(mm, dtype="<f8", count=count, offset=rates_offset).astype(np.float64)
+            meta = json.loads(mm[meta_offset:meta_offset + meta_size])
+    except (OSError, ValueError, struct.error):
+        return None
+
+    return CrossRates(codes, values, meta)
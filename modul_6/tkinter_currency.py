@@ -1,43 +1,185 @@
+import argparse
+import http.client
+import json
+import queue
+import threading
+import time
 import tkinter as tk
-from tkinter import messagebox
+import urllib.parse
 import urllib.request
-import json
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import messagebox, ttk
+
+
+API_URL = "https://api.exchangerate-api.com/v4/latest/{currency}"
+PROVIDER = "https://www.exchangerate-api.com"
+
+# Повторный запрос той же валюты в течение CACHE_TTL секунд берётся из памяти
+CACHE_TTL = 600
+# Сколько строк таблицы вставлять за один шаг mainloop
+RENDER_CHUNK = 40
+# Как часто mainloop забирает готовые результаты из фоновых потоков, мс
+POLL_INTERVAL_MS = 50
+
+
+class CurrencyApp:
+    """
+    Окно курсов валют. Сетевые запросы выполняются в фоновых потоках,
+    результаты передаются в поток Tk через очередь, которую опрашивает root.after.
+    """
+
+    def __init__(self, root: tk.Tk, proxy_url: str = None):
+        self.root = root
+        self.proxy = urllib.parse.urlsplit(proxy_url) if proxy_url else None
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="fetch")
+        self.results = queue.Queue()
+        # currency -> (data, fetched_at)
+        self.cache = {}
+        # Постоянное соединение с локальным прокси, своё у каждого фонового потока
+        self.local = threading.local()
+        # Последняя запрошенная валюта: более старые ответы только кладём в кеш
+        self.requested = None
+        # code -> (iid строки в таблице, отображаемый курс)
+        self.rows = {}
+        # Номер текущей отрисовки, чтобы прервать устаревшую пошаговую вставку
+        self.render_generation = 0
+
+        root.title("Курсы валют")
+
+        # Поле ввода
+        tk.Label(root, text="Введите код валюты (3 буквы):").pack()
+        self.entry = tk.Entry(root, width=10)
+        self.entry.pack()
+        self.entry.bind("<Return>", lambda event: self.fetch_currency())
+
+        # Кнопка запроса
+        tk.Button(root, text="Получить курс", command=self.fetch_currency).pack()
 
+        self.status = tk.StringVar()
+        tk.Label(root, textvariable=self.status).pack()
 
-def fetch_currency():
-    currency = entry.get().strip().upper()
+        # Таблица курсов: строки обновляются на месте, а не перерисовываются целиком
+        self.tree = ttk.Treeview(root, columns=("rate",), height=25)
+        self.tree.heading("#0", text="Валюта")
+        self.tree.heading("rate", text="Курс")
+        self.tree.pack(fill=tk.BOTH, expand=True)
 
-    if len(currency) != 3:
-        messagebox.showerror("Ошибка", "Введите 3-буквенный код валюты (например: USD, EUR)")
-        return
+        root.after(POLL_INTERVAL_MS, self.poll_results)
 
-    try:
-        with urllib.request.urlopen(f"https://api.exchangerate-api.com/v4/latest/{currency}") as response:
+    def fetch_currency(self):
+        currency = self.entry.get().strip().upper()
+
+        if len(currency) != 3:
+            messagebox.showerror("Ошибка", "Введите 3-буквенный код валюты (например: USD, EUR)")
+            return
+
+        self.requested = currency
+        cached = self.cache.get(currency)
+        if cached is not None and time.monotonic() - cached[1] < CACHE_TTL:
+            self.show_rates(cached[0])
+            return
+
+        self.status.set(f"Загрузка {currency}...")
+        self.executor.submit(self.load, currency)
+
+    # --- Фоновые потоки: Tk отсюда не вызываем, только кладём результат в очередь ---
+
+    def load(self, currency: str):
+        try:
+            data = self.load_from_proxy(currency) if self.proxy else self.load_from_api(currency)
+            self.results.put((currency, data, None))
+        except Exception as e:
+            self.results.put((currency, None, e))
+
+    @staticmethod
+    def load_from_api(currency: str) -> dict:
+        with urllib.request.urlopen(API_URL.format(currency=currency)) as response:
             data = json.loads(response.read().decode('utf-8'))
-            data["provider"] = "https://www.exchangerate-api.com"
+            data["provider"] = PROVIDER
+            return data
+
+    def load_from_proxy(self, currency: str) -> dict:
+        path = f"{self.proxy.path.rstrip('/')}/{currency}"
+        for attempt in range(2):
+            conn = getattr(self.local, "conn", None)
+            reused = conn is not None
+            if conn is None:
+                conn_class = http.client.HTTPSConnection if self.proxy.scheme == "https" else http.client.HTTPConnection
+                conn = self.local.conn = conn_class(self.proxy.netloc, timeout=10)
+            try:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                body = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                self.local.conn = None
+                # Прокси мог закрыть простаивавшее соединение - пробуем ещё раз на новом
+                if not reused:
+                    raise
+
+        data = json.loads(body.decode('utf-8'))
+        if response.status != 200:
+            raise RuntimeError(data.get("error", f"HTTP {response.status}"))
+        return data
+
+    # --- Поток Tk ---
+
+    def poll_results(self):
+        while True:
+            try:
+                currency, data, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if error is not None:
+                if currency == self.requested:
+                    self.status.set("")
+                    messagebox.showerror("Ошибка", f"Не удалось получить данные: {str(error)}")
+                continue
+            self.cache[currency] = (data, time.monotonic())
+            if currency == self.requested:
+                self.show_rates(data)
+        self.root.after(POLL_INTERVAL_MS, self.poll_results)
 
-            # Отображаем JSON в текстовом поле с форматированием
-            text.delete(1.0, tk.END)
-            text.insert(tk.END, json.dumps(data, indent=2))
+    def show_rates(self, data: dict):
+        self.status.set(
+            f"База {data.get('base')}, дата {data.get('date')}, источник {data.get('provider', PROVIDER)}"
+        )
+        self.render_generation += 1
+        self.render_chunk(list(data["rates"].items()), 0, self.render_generation)
 
-    except Exception as e:
-        messagebox.showerror("Ошибка", f"Не удалось получить данные: {str(e)}")
+    def render_chunk(self, rates: list, start: int, generation: int):
+        """Вставляет/обновляет RENDER_CHUNK строк и отдаёт управление mainloop до следующей порции"""
+        if generation != self.render_generation:
+            return
 
+        for code, rate in rates[start:start + RENDER_CHUNK]:
+            text = f"{rate:g}" if isinstance(rate, (int, float)) else str(rate)
+            row = self.rows.get(code)
+            if row is None:
+                self.rows[code] = (self.tree.insert("", tk.END, text=code, values=(text,)), text)
+            elif row[1] != text:
+                self.tree.item(row[0], values=(text,))
+                self.rows[code] = (row[0], text)
 
-# Создаем главное окно
-root = tk.Tk()
-root.title("Курсы валют")
+        start += RENDER_CHUNK
+        if start < len(rates):
+            self.root.after(1, self.render_chunk, rates, start, generation)
+            return
 
-# Поле ввода
-tk.Label(root, text="Введите код валюты (3 буквы):").pack()
-entry = tk.Entry(root, width=10)
-entry.pack()
+        # Убираем валюты, которых нет в новой таблице
+        codes = {code for code, _ in rates}
+        for code in [code for code in self.rows if code not in codes]:
+            self.tree.delete(self.rows.pop(code)[0])
 
-# Кнопка запроса
-tk.Button(root, text="Получить курс", command=fetch_currency).pack()
 
-# Текстовое поле для вывода JSON
-text = tk.Text(root, width=80, height=30)
-text.pack()
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Курсы валют")
+    parser.add_argument("--proxy", help="адрес локального currency_server, например http://127.0.0.1:8000")
+    args = parser.parse_args()
 
-root.mainloop()
\ No newline at end of file
+    # Создаем главное окно
+    root = tk.Tk()
+    app = CurrencyApp(root, args.proxy)
+    root.mainloop()
+    app.executor.shutdown(wait=False, cancel_futures=True)